@@ -0,0 +1,104 @@
+import asyncio
+import logging
+
+from assistants.sales.fact_resolver import format_field, load_page_data
+from model.output_schema import AgentAction, CourseRef, PreSalesAgentOutputSchema, PreSalesAgentResponseSchema
+from services import metrics
+
+
+logger = logging.getLogger("Action Enrichment")
+
+
+ACTION_LABELS = {
+    "details": "View Details: {title}",
+    "interest": "I'm interested in {title}",
+}
+
+
+ACTION_ENRICHMENT_RESULTS = metrics.counter(
+    "action_enrichment_total",
+    "Model-emitted action slugs expanded into buttons, by outcome"
+)
+
+
+async def lookup_course_ref(slug: str, context_data: dict | None) -> CourseRef | None:
+    """`None` for unknown slugs and failed lookups, the action is dropped rather than the reply"""
+    try:
+        course = await load_page_data(context_data, slug)
+        if not course:
+            return None
+
+        return CourseRef(
+            id=str(course.get("id", "")),
+            title=format_field(course.get("title")) or slug,
+            slug=slug
+        )
+    except Exception:
+        logger.exception(f"Course lookup for action slug {slug} failed")
+        ACTION_ENRICHMENT_RESULTS.inc(outcome="error")
+        return None
+
+
+async def lookup_course_refs(slugs: list[str], context_data: dict | None) -> dict[str, CourseRef]:
+    """Id and title for every slug that resolves to a course, unknown slugs are left out"""
+    unique_slugs = list(dict.fromkeys(slugs))
+    course_refs = await asyncio.gather(*(lookup_course_ref(slug, context_data) for slug in unique_slugs))
+
+    return {
+        slug: course_ref
+        for slug, course_ref in zip(unique_slugs, course_refs)
+        if course_ref is not None
+    }
+
+
+async def enrich_actions(actions: list[dict], context_data: dict | None) -> list[dict]:
+    """
+    Expand `{"type", "slug"}` actions into full `AgentAction` dumps. Actions
+    that already carry a course pass through, unknown slugs and duplicates are dropped.
+    """
+    course_refs = await lookup_course_refs(
+        [action["slug"] for action in actions if "course" not in action],
+        context_data
+    )
+
+    enriched, seen = [], set()
+    for action in actions:
+        if "course" in action:
+            enriched.append(action)
+            continue
+
+        course_ref = course_refs.get(action["slug"])
+        if course_ref is None:
+            ACTION_ENRICHMENT_RESULTS.inc(outcome="dropped")
+            logger.info(f"Dropped action for unknown slug {action['slug']!r}")
+            continue
+
+        if (action["type"], course_ref.slug) in seen:
+            ACTION_ENRICHMENT_RESULTS.inc(outcome="duplicate")
+            continue
+        seen.add((action["type"], course_ref.slug))
+
+        ACTION_ENRICHMENT_RESULTS.inc(outcome="enriched")
+        enriched.append(AgentAction(
+            type=action["type"],
+            label=ACTION_LABELS[action["type"]].format(title=course_ref.title),
+            course=course_ref
+        ).model_dump())
+
+    return enriched
+
+
+async def enrich_response(output: PreSalesAgentOutputSchema, context_data: dict | None) -> PreSalesAgentResponseSchema:
+    response = output.model_dump()
+    response["actions"] = await enrich_actions(response.get("actions") or [], context_data)
+    return PreSalesAgentResponseSchema.model_validate(response)
+
+
+async def enrich_history(history: list[dict]) -> list[dict]:
+    """Stored turns keep the model's slug-only actions, expand them for the history endpoint"""
+    for item in history:
+        content = item.get("content")
+        if item.get("role") == "assistant" and isinstance(content, dict) and content.get("actions"):
+            content["actions"] = await enrich_actions(content["actions"], None)
+
+    return history
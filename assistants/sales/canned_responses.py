@@ -0,0 +1,102 @@
+import itertools
+import json
+import logging
+import os
+
+from dotenv import load_dotenv
+
+from model.output_schema import GuardrailDecision, GuardrailAgentResponse
+from services import metrics
+
+
+load_dotenv()
+
+
+logger = logging.getLogger("Canned Responses")
+
+
+# Guardrail model returns only the category, speech for non-routed categories comes from the pools below
+GUARDRAIL_CANNED_SPEECH = os.getenv("GUARDRAIL_CANNED_SPEECH", 'False') == 'True'
+# Optional JSON file {"GREETING_SMALLTALK": ["...", ...], ...} replacing the built-in pools per category
+GUARDRAIL_CANNED_SPEECH_FILE = os.getenv("GUARDRAIL_CANNED_SPEECH_FILE")
+
+
+CANNED_SPEECH_RESULTS = metrics.counter(
+    "guardrail_canned_speech_total",
+    "Guardrail replies served from the canned template pools, by category"
+)
+
+
+# Templates using {page_title} are only picked when the page title is known
+DEFAULT_SPEECH_POOLS: dict[GuardrailDecision, list[str]] = {
+    GuardrailDecision.greeting_or_small_talk: [
+        "Hi there! I'm the Blue Academy assistant. How can I help you find the right course today?",
+        "Hello! Happy to help. Are you looking for a course or do you have a question about one?",
+        "Hi! I see you're checking out {page_title}. Would you like to know about its fee, duration or syllabus?",
+        "Hey! Ask me anything about {page_title} or any other Blue Academy course.",
+    ],
+    GuardrailDecision.out_of_scope_general: [
+        "I can only help with Blue Academy courses. Is there a topic you'd like to learn?",
+        "That's outside what I can help with, but I'd be glad to help you find a course.",
+        "I'm here for questions about our courses. Would you like to know more about {page_title}?",
+    ],
+    GuardrailDecision.out_of_scope_technical: [
+        "Sorry, I didn't quite understand that. I can help you with our courses, fees, duration and enrolment.",
+    ],
+    GuardrailDecision.unknown: [
+        "Sorry, I didn't catch that. Could you tell me what you're looking for?",
+        "Could you rephrase that? I can help with course details, fees and enrolment.",
+        "I'm not sure I followed. Are you asking about {page_title} or another course?",
+    ],
+}
+
+
+def load_speech_pools() -> dict[GuardrailDecision, list[str]]:
+    pools = dict(DEFAULT_SPEECH_POOLS)
+    if not GUARDRAIL_CANNED_SPEECH_FILE:
+        return pools
+
+    try:
+        with open(GUARDRAIL_CANNED_SPEECH_FILE) as file:
+            overrides = json.load(file)
+    except (OSError, json.JSONDecodeError):
+        logger.exception(f"Could not load canned speech from {GUARDRAIL_CANNED_SPEECH_FILE}, using defaults")
+        return pools
+
+    for category, templates in overrides.items():
+        if templates:
+            pools[GuardrailDecision(category)] = list(templates)
+
+    return pools
+
+
+SPEECH_POOLS = load_speech_pools()
+_rotation: dict[GuardrailDecision, itertools.count] = {
+    decision: itertools.count() for decision in SPEECH_POOLS
+}
+
+
+def pick_canned_speech(decision: GuardrailDecision, page_title: str | None = None) -> str | None:
+    """Next template in the category's rotation, personalised with the page title when known"""
+    pool = SPEECH_POOLS.get(decision)
+    if not pool:
+        return None
+
+    eligible = [template for template in pool if page_title or "{page_title}" not in template]
+    if not eligible:
+        return None
+
+    template = eligible[next(_rotation[decision]) % len(eligible)]
+    return template.format(page_title=page_title) if page_title else template
+
+
+def apply_canned_speech(output: GuardrailAgentResponse, page_title: str | None = None) -> GuardrailAgentResponse:
+    if not GUARDRAIL_CANNED_SPEECH or not output.is_guardrail_output_triggered:
+        return output
+
+    speech = pick_canned_speech(output.guardrail_decision, page_title)
+    if speech is None:
+        return output
+
+    CANNED_SPEECH_RESULTS.inc(category=output.guardrail_decision.value)
+    return output.model_copy(update={"speech": speech})
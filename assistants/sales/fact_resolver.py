@@ -0,0 +1,183 @@
+import logging
+import os
+from dataclasses import dataclass
+from enum import Enum
+
+import regex as re
+from dotenv import load_dotenv
+
+from model.output_schema import AgentAction, CourseRef, PreSalesAgentResponseSchema
+from services import metrics
+from services.data_handler import clean_text, extract_text
+from services.page_data_handler import get_course_document, get_prefetched_page_data, resolve_page_data_by_slug
+
+
+load_dotenv()
+
+
+logger = logging.getLogger("Fact Resolver")
+
+
+FACT_RESOLVER_ENABLED = os.getenv("FACT_RESOLVER", 'True') == 'True'
+# Single-field lookups are short, anything longer usually needs the agent
+FACT_MAX_WORDS = 10
+# Long field values (skill lists, prerequisites) are cut for speech
+FACT_MAX_VALUE_CHARS = 300
+
+
+FACT_RESULTS = metrics.counter(
+    "fact_resolver_total",
+    "Course page questions seen by the fact resolver, by intent and outcome"
+)
+
+
+class FactIntent(str, Enum):
+    fee = "fee"
+    duration = "duration"
+    prerequisites = "prerequisites"
+    category = "category"
+    skills = "skills"
+
+
+@dataclass
+class FactRule:
+    intent: FactIntent
+    field: str
+    pattern: re.Pattern
+    template: str
+
+
+def _rule(intent: FactIntent, field: str, pattern: str, template: str) -> FactRule:
+    return FactRule(
+        intent=intent,
+        field=field,
+        pattern=re.compile(pattern, flags=re.IGNORECASE),
+        template=template,
+    )
+
+
+FACT_RULES: list[FactRule] = [
+    _rule(
+        FactIntent.fee, "fee",
+        r"\b(fees?|pric(e|ing)|cost|how\s+much(?!\s+time))\b",
+        "The fee for {title} is {value}.",
+    ),
+    _rule(
+        FactIntent.duration, "duration",
+        r"\b(duration|how\s+long|how\s+much\s+time|how\s+many\s+(weeks|months|hours)|length\s+of)\b",
+        "{title} runs for {value}.",
+    ),
+    _rule(
+        FactIntent.prerequisites, "prerequisites",
+        r"\b(pre-?requisites?|requirements?|eligib(le|ility)|need\s+to\s+know\s+before)\b",
+        "To join {title} you'll need: {value}.",
+    ),
+    _rule(
+        FactIntent.category, "category",
+        r"\b(category|categories|what\s+(kind|type)\s+of\s+course)\b",
+        "{title} is part of our {value} courses.",
+    ),
+    _rule(
+        FactIntent.skills, "skills",
+        r"\b(skills?|what\s+will\s+i\s+learn|what\s+do\s+i\s+learn|learning\s+outcomes?)\b",
+        "In {title} you'll build skills in {value}.",
+    ),
+]
+
+# Questions that mention these need reasoning over more than one field or course
+EXCLUDE_PATTERN = re.compile(
+    r"\b(other|compare|vs|versus|cheaper|than|discount|emi|instal(l)?ments?|refund|scholarship|"
+    r"all\s+courses|and|also)\b|@|\+\d",
+    flags=re.IGNORECASE
+)
+
+FOLLOW_UP = " Would you like to know anything else about this course?"
+
+
+def match_fact_intent(message: str) -> FactRule | None:
+    """The single fact a message asks for, `None` when it asks for none or several"""
+    if len(message.split()) > FACT_MAX_WORDS or EXCLUDE_PATTERN.search(message):
+        return None
+
+    matched = [rule for rule in FACT_RULES if rule.pattern.search(message)]
+    return matched[0] if len(matched) == 1 else None
+
+
+def format_field(value) -> str:
+    if isinstance(value, (int, float)):
+        text = str(value)
+    else:
+        text = clean_text(extract_text(value))
+
+    if len(text) > FACT_MAX_VALUE_CHARS:
+        text = text[:FACT_MAX_VALUE_CHARS].rsplit(" ", 1)[0] + "..."
+
+    return text.rstrip(".")
+
+
+async def load_page_data(context_data: dict | None, slug: str) -> dict | None:
+    """The course document for `slug`, prefetched when the run already started loading it"""
+    page_data = await get_prefetched_page_data(context_data, slug)
+    if page_data is None:
+        page_data, _ = await resolve_page_data_by_slug(slug)
+    return get_course_document(page_data)
+
+
+async def resolve_fact_question(message: str, context_data: dict) -> dict | None:
+    """
+    Answer a single-field question about the current course page straight from
+    its page data. Returns a `PreSalesAgentResponseSchema` dump, or `None` when
+    the question should go to the agent, including when the lookup fails.
+    """
+    if not FACT_RESOLVER_ENABLED:
+        return None
+
+    try:
+        return await answer_fact_question(message, context_data)
+    except Exception:
+        logger.exception("Fact resolver failed, handing the question to the agent")
+        FACT_RESULTS.inc(intent="unknown", outcome="error")
+        return None
+
+
+async def answer_fact_question(message: str, context_data: dict) -> dict | None:
+    page_context = context_data.get("page_context") or {}
+    user_context = context_data.get("user_context") or {}
+    slug = page_context.get("slug")
+
+    if page_context.get("page_type") != "particular_course_page" or not slug or user_context.get("action"):
+        return None
+
+    rule = match_fact_intent(message)
+    if rule is None:
+        FACT_RESULTS.inc(intent="none", outcome="no_match")
+        return None
+
+    page_data = await load_page_data(context_data, slug)
+    if not page_data:
+        FACT_RESULTS.inc(intent=rule.intent.value, outcome="no_page_data")
+        return None
+
+    value = format_field(page_data.get(rule.field))
+    title = format_field(page_data.get("title")) or "This course"
+    if not value:
+        FACT_RESULTS.inc(intent=rule.intent.value, outcome="missing_field")
+        return None
+
+    response = PreSalesAgentResponseSchema(
+        speech=rule.template.format(title=title, value=value) + FOLLOW_UP,
+        intent="course_inquiry",
+        confidence="high",
+        actions=[
+            AgentAction(
+                type="interest",
+                label=f"I'm interested in {title}",
+                course=CourseRef(id=str(page_data.get("id", "")), title=title, slug=slug),
+            )
+        ],
+    )
+
+    FACT_RESULTS.inc(intent=rule.intent.value, outcome="answered")
+    logger.info(f"Answered {rule.intent.value} question for {slug} from page data")
+
+    return response.model_dump()
@@ -1,4 +1,8 @@
+import hashlib
 import json
+from enum import Enum
+
+import regex as re
 
 from agents import (
     RunContextWrapper,
@@ -6,13 +10,29 @@ from agents import (
     ModelSettings,
     TResponseInputItem,
     Runner,
-    GuardrailFunctionOutput, input_guardrail
+    RunConfig,
+    GuardrailFunctionOutput, input_guardrail,
+    InputGuardrailResult,
+    InputGuardrailTripwireTriggered
 )
+from assistants.sales.canned_responses import GUARDRAIL_CANNED_SPEECH, apply_canned_speech
+from assistants.sales.guardrail_classifier import preclassify, record_shadow_result
 from model.input_schema import AgentContext
-from model.output_schema import GuardrailAgentResponse
+from services.prompt_cache import prompt_cache_args, record_run_usage
+from services.model_hedging import get_model_provider
+from services.guardrail_cache import build_cache_key, get_cached_verdict, set_cached_verdict
+from model.output_schema import GuardrailAgentResponse, GuardrailCategoryResponse, GuardrailDecision
+from services import metrics
+
+
+SPEECH_RESPONSE_FORMAT = """COURSE_INQUIRY, PAGE_INQUIRY, LEAD_INFORMATION: speech=""
+Others: speech=direct response (1-2 sentences)"""
+CATEGORY_RESPONSE_FORMAT = "Return only guardrail_decision."
 
 
 def get_dynamic_instruction(ctx: RunContextWrapper[AgentContext], agent: Agent):
+    response_format = CATEGORY_RESPONSE_FORMAT if getattr(agent, "canned_speech", False) else SPEECH_RESPONSE_FORMAT
+
     system_instruction = f"""
 You are an input classifier for a PRE-SALES education platform. Route potential learners to the pre-sales agent.
 
@@ -65,8 +85,7 @@ Exception: `If What is` or `Tell me about` [anything] for this course where anyt
 
 ## Response Format
 
-COURSE_INQUIRY, PAGE_INQUIRY, LEAD_INFORMATION: speech=""
-Others: speech=direct response (1-2 sentences)
+{response_format}
 
 
 ## Ambiguity Avoidance
@@ -91,42 +110,188 @@ Classify now.
 
 
 class GuardrailAgent(Agent):
-    def __init__(self):
+    def __init__(self, canned_speech: bool = GUARDRAIL_CANNED_SPEECH):
+        # Set first, the instruction function reads it to pick the response format
+        self.canned_speech = canned_speech
         super().__init__(
             name = "Input Guardrail Agent",
             instructions = get_dynamic_instruction,
-            output_type = GuardrailAgentResponse,
+            # With canned speech the model only names the category, which keeps its output a few tokens long
+            output_type = GuardrailCategoryResponse if canned_speech else GuardrailAgentResponse,
             model = "gpt-4o-mini",
             model_settings = ModelSettings(
-                verbosity="medium"
+                verbosity="medium",
+                extra_args=prompt_cache_args("Input Guardrail Agent", get_dynamic_instruction(None, self))
             )
         )
 
 
 GUARDRAIL_AGENT = GuardrailAgent()
 
+# Bump when the classification rules change in a way the prompt hash does not capture
+GUARDRAIL_PROMPT_VERSION = "1"
+GUARDRAIL_CACHE_VERSION = "v{}-{}".format(
+    GUARDRAIL_PROMPT_VERSION,
+    hashlib.sha1(f"{GUARDRAIL_AGENT.model}:{get_dynamic_instruction(None, GUARDRAIL_AGENT)}".encode()).hexdigest()[:8]
+)
 
+GUARDRAIL_BYPASS = metrics.counter(
+    "guardrail_bypass_total",
+    "Messages that skipped guardrail classification, by reason"
+)
 
-@input_guardrail(run_in_parallel=False)
-async def input_guardrail_agent(
-        ctx: RunContextWrapper[None], agent: Agent, input_message: str | list[TResponseInputItem]
-) -> GuardrailFunctionOutput:
+# Items read back from the session to fingerprint the conversational state
+GUARDRAIL_STATE_ITEMS = 6
+CONTACT_REQUEST_PATTERN = re.compile(
+    r"\b(e-?mail|phone|contact\s+(details|number)|your\s+name)\b",
+    flags=re.IGNORECASE
+)
+
+
+
+class GuardrailMode(str, Enum):
+    """How the input guardrail is scheduled relative to the main agent"""
+    sequential = "sequential"
+    speculative = "speculative"
+    # The pre-sales agent classifies and answers in one structured output
+    single_call = "single_call"
 
+
+def extract_user_input(input_message: str | list[TResponseInputItem]) -> str:
     if isinstance(input_message, list):
-        user_input = next(
+        return next(
             item['content']
             for item in reversed(input_message)
             if item.get('role') == 'user'
         )
-    else :
-        user_input = input_message
+
+    return input_message
+
+
+def get_item_text(item: TResponseInputItem) -> str:
+    content = item.get("content")
+    if isinstance(content, list):
+        return " ".join(
+            part.get("text", "")
+            for part in content
+            if isinstance(part, dict)
+        )
+    return str(content or "")
+
+
+def build_state_fingerprint(input_message: str | list[TResponseInputItem], context: dict | None) -> str:
+    """
+    Compact summary of the state the ambiguity rules depend on:
+    whether the assistant just asked for contact details and whether a widget action is set.
+    """
+    contact_requested = False
+    if isinstance(input_message, list):
+        last_assistant = next(
+            (item for item in reversed(input_message) if item.get("role") == "assistant"),
+            None
+        )
+        if last_assistant is not None:
+            contact_requested = bool(CONTACT_REQUEST_PATTERN.search(get_item_text(last_assistant)))
+
+    user_context = (context or {}).get("user_context") or {}
+    has_action = bool(user_context.get("action"))
+
+    return f"c{int(contact_requested)}a{int(has_action)}"
+
+
+def get_page_title(context: dict | None) -> str | None:
+    page_context = (context or {}).get("page_context") or {}
+    return page_context.get("title")
 
 
-    result = await Runner.run(GUARDRAIL_AGENT, user_input, context=None)
+async def classify_user_input(
+        user_input: str,
+        state_fingerprint: str = "c0a0",
+        page_title: str | None = None
+) -> GuardrailAgentResponse:
+    local_output, local_verdict = await preclassify(user_input)
+    if local_output is not None:
+        return apply_canned_speech(local_output, page_title)
+
+    cache_key = build_cache_key(GUARDRAIL_CACHE_VERSION, user_input, state_fingerprint)
+    cached_output = await get_cached_verdict(cache_key)
+    if cached_output is not None:
+        record_shadow_result(user_input, local_verdict, cached_output)
+        return apply_canned_speech(cached_output, page_title)
+
+    result = await Runner.run(
+        GUARDRAIL_AGENT,
+        user_input,
+        context=None,
+        run_config=RunConfig(model_provider=get_model_provider())
+    )
+    record_run_usage(GUARDRAIL_AGENT.name, result.context_wrapper.usage)
+
+    guardrail_output = result.final_output
+    if isinstance(guardrail_output, GuardrailCategoryResponse):
+        guardrail_output = guardrail_output.to_response()
+
+    record_shadow_result(user_input, local_verdict, guardrail_output)
+    # Cached without personalised speech, templates are applied per request
+    await set_cached_verdict(cache_key, guardrail_output)
+
+    return apply_canned_speech(guardrail_output, page_title)
+
+
+def get_trusted_action_verdict(context: dict | None) -> GuardrailAgentResponse | None:
+    """Messages sent by a verified widget button come from our own UI and skip classification"""
+    if not (context or {}).get("trusted_action"):
+        return None
+
+    GUARDRAIL_BYPASS.inc(reason="trusted_action")
+    return GuardrailAgentResponse(
+        guardrail_decision=GuardrailDecision.lead_information,
+        reason="Trusted widget action",
+        speech=""
+    )
+
+
+async def classify_session_input(user_input: str, session, context: dict | None) -> GuardrailAgentResponse:
+    """Classify a message that has not been written to the session yet"""
+    trusted_verdict = get_trusted_action_verdict(context)
+    if trusted_verdict is not None:
+        return trusted_verdict
+
+    history = await session.get_items(limit=GUARDRAIL_STATE_ITEMS)
+    state_fingerprint = build_state_fingerprint(
+        history + [{"role": "user", "content": user_input}],
+        context
+    )
+    return await classify_user_input(user_input, state_fingerprint, get_page_title(context))
+
+
+@input_guardrail(run_in_parallel=False)
+async def input_guardrail_agent(
+        ctx: RunContextWrapper[None], agent: Agent, input_message: str | list[TResponseInputItem]
+) -> GuardrailFunctionOutput:
+
+    guardrail_output = get_trusted_action_verdict(ctx.context)
+    if guardrail_output is None:
+        user_input = extract_user_input(input_message)
+        state_fingerprint = build_state_fingerprint(input_message, ctx.context)
+        guardrail_output = await classify_user_input(user_input, state_fingerprint, get_page_title(ctx.context))
 
     return GuardrailFunctionOutput(
-        output_info = result.final_output,
-        tripwire_triggered=result.final_output.is_guardrail_output_triggered
+        output_info = guardrail_output,
+        tripwire_triggered=guardrail_output.is_guardrail_output_triggered
+    )
+
+
+def build_guardrail_tripwire(guardrail_output: GuardrailAgentResponse) -> InputGuardrailTripwireTriggered:
+    """Wrap a verdict obtained outside the runner so callers can handle it like a regular tripwire"""
+    return InputGuardrailTripwireTriggered(
+        InputGuardrailResult(
+            guardrail=input_guardrail_agent,
+            output=GuardrailFunctionOutput(
+                output_info=guardrail_output,
+                tripwire_triggered=True
+            )
+        )
     )
 
 
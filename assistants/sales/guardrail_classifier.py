@@ -0,0 +1,302 @@
+import asyncio
+import logging
+import os
+from dataclasses import dataclass
+from enum import Enum
+
+import regex as re
+from dotenv import load_dotenv
+
+from model.output_schema import GuardrailDecision, GuardrailAgentResponse
+from services import metrics
+from services.similarity import embed_texts, get_query_embedding, cosine_similarity
+
+
+load_dotenv()
+
+
+logger = logging.getLogger("Guardrail Pre-Classifier")
+
+
+class PreClassifierMode(str, Enum):
+    off = "off"
+    shadow = "shadow"
+    on = "on"
+
+
+PRECLASSIFIER_MODE = PreClassifierMode(os.getenv("GUARDRAIL_PRECLASSIFIER", PreClassifierMode.off.value))
+PRECLASSIFIER_THRESHOLD = float(os.getenv("GUARDRAIL_PRECLASSIFIER_THRESHOLD", "0.9"))
+PRECLASSIFIER_USE_EMBEDDINGS = os.getenv("GUARDRAIL_PRECLASSIFIER_EMBEDDINGS", 'False') == 'True'
+# Only short messages are worth an embedding lookup, long ones almost always need the model
+EMBEDDING_MAX_WORDS = 12
+EMBEDDING_MIN_MARGIN = 0.05
+
+
+PRECLASSIFIER_RESULTS = metrics.counter(
+    "guardrail_preclassifier_total",
+    "Local guardrail classifications by category and whether they skipped the LLM"
+)
+PRECLASSIFIER_SHADOW = metrics.counter(
+    "guardrail_preclassifier_shadow_total",
+    "Shadow mode comparisons between the local classifier and the guardrail LLM"
+)
+
+
+DEFAULT_SPEECH = {
+    GuardrailDecision.greeting_or_small_talk: "Hi there! I'm the Blue Academy assistant. How can I help you find the right course today?",
+    GuardrailDecision.out_of_scope_technical: "Sorry, I didn't quite understand that. I can help you with our courses, fees, duration and enrolment.",
+    GuardrailDecision.out_of_scope_general: "I can only help with Blue Academy courses. Is there a topic you'd like to learn?",
+    GuardrailDecision.unknown: "Sorry, I didn't catch that. Could you tell me what you're looking for?",
+}
+
+
+@dataclass
+class PatternRule:
+    decision: GuardrailDecision
+    confidence: float
+    pattern: re.Pattern
+    speech: str = ""
+
+
+def _rule(decision: GuardrailDecision, confidence: float, pattern: str, speech: str = "") -> PatternRule:
+    return PatternRule(
+        decision=decision,
+        confidence=confidence,
+        pattern=re.compile(pattern, flags=re.IGNORECASE),
+        speech=speech,
+    )
+
+
+# Ordered: the first matching rule wins, narrow out-of-scope rules go before the broad course rule
+PATTERN_TABLE: list[PatternRule] = [
+    _rule(
+        GuardrailDecision.greeting_or_small_talk, 0.97,
+        r"^\s*(hi+|hello+|hey+|hiya|hola|namaste|yo|good\s+(morning|afternoon|evening))(\s+there)?[\s!.]*$",
+        DEFAULT_SPEECH[GuardrailDecision.greeting_or_small_talk],
+    ),
+    _rule(
+        GuardrailDecision.greeting_or_small_talk, 0.97,
+        r"^\s*(thanks|thank\s+you|thx|ty|thanks\s+a\s+lot|thank\s+you\s+so\s+much|great,?\s+thanks)[\s!.]*$",
+        "You're welcome! Let me know if there's anything else I can help you with.",
+    ),
+    _rule(
+        GuardrailDecision.greeting_or_small_talk, 0.95,
+        r"^\s*(bye|goodbye|see\s+you)[\s!.]*$",
+        "Happy to help! Feel free to reach out if you have any other questions about our courses.",
+    ),
+    # A bare acknowledgement may answer the agent's last question ("shall I share the
+    # syllabus?"), which a rule cannot see. Kept below PRECLASSIFIER_THRESHOLD so it
+    # only feeds the shadow metrics and the model always classifies it.
+    _rule(
+        GuardrailDecision.greeting_or_small_talk, 0.5,
+        r"^\s*(ok(ay)?|cool|great|nice|got\s+it)[\s!.]*$",
+    ),
+    _rule(
+        GuardrailDecision.lead_information, 0.95,
+        r"[a-z0-9._%+-]+@[a-z0-9.-]+\.[a-z]{2,}|\+\d[\d\s-]{6,}",
+    ),
+    # Before the course rule, technical requests often mention a course or its project
+    _rule(
+        GuardrailDecision.out_of_scope_technical, 0.9,
+        r"\b(debug|traceback|stack\s*trace|my\s+(code|app|error|build|project)|fix\s+(my|this)\s+(code|error|bug))\b",
+        DEFAULT_SPEECH[GuardrailDecision.out_of_scope_technical],
+    ),
+    _rule(
+        GuardrailDecision.course_inquiry, 0.93,
+        r"\b(fees?|pric(e|ing)|cost|how\s+much|duration|how\s+long|prerequisites?|syllabus|curriculum|"
+        r"certificat(e|ion)|batch(es)?|enrol(l)?(ment)?|courses?|i'?m\s+interested)\b",
+    ),
+    _rule(
+        GuardrailDecision.page_inquiry, 0.9,
+        r"\b(log\s*in|sign\s*(in|up)|contact\s+page|about\s+page|where\s+can\s+i\s+find)\b",
+    ),
+]
+
+
+LABELLED_EXAMPLES: dict[GuardrailDecision, list[str]] = {
+    GuardrailDecision.course_inquiry: [
+        "what is the fee for this course",
+        "how long does the course take",
+        "what are the prerequisites",
+        "do you have python courses",
+        "i want to learn data science",
+        "tell me about the curriculum",
+        "is there a certificate after completion",
+    ],
+    GuardrailDecision.page_inquiry: [
+        "where is the login page",
+        "how do i sign up",
+        "where can i find the course list",
+    ],
+    GuardrailDecision.lead_information: [
+        "i want to enroll",
+        "can someone call me",
+        "book a consultation",
+    ],
+    GuardrailDecision.greeting_or_small_talk: [
+        "hello how are you",
+        "good morning",
+        "thanks for the help",
+    ],
+    GuardrailDecision.out_of_scope_general: [
+        "what is the weather today",
+        "who won the match yesterday",
+        "tell me the latest news",
+    ],
+    GuardrailDecision.out_of_scope_technical: [
+        "my code is throwing an error",
+        "help me debug this function",
+        "my app crashed after deployment",
+    ],
+}
+
+
+@dataclass
+class LocalVerdict:
+    decision: GuardrailDecision
+    confidence: float
+    source: str
+    speech: str = ""
+
+    def to_response(self) -> GuardrailAgentResponse:
+        routed = self.decision in (
+            GuardrailDecision.course_inquiry,
+            GuardrailDecision.page_inquiry,
+            GuardrailDecision.lead_information,
+        )
+        return GuardrailAgentResponse(
+            guardrail_decision=self.decision,
+            reason=f"Local {self.source} match ({self.confidence:.2f})",
+            speech="" if routed else (self.speech or DEFAULT_SPEECH.get(self.decision, "")),
+        )
+
+
+_example_vectors: list[tuple[GuardrailDecision, list[float]]] | None = None
+_example_lock = asyncio.Lock()
+
+
+async def load_example_vectors() -> list[tuple[GuardrailDecision, list[float]]]:
+    global _example_vectors
+    if _example_vectors is not None:
+        return _example_vectors
+
+    async with _example_lock:
+        if _example_vectors is None:
+            labelled = [
+                (decision, example)
+                for decision, examples in LABELLED_EXAMPLES.items()
+                for example in examples
+            ]
+            vectors = await embed_texts([example for _, example in labelled])
+            _example_vectors = [
+                (decision, vector)
+                for (decision, _), vector in zip(labelled, vectors)
+            ]
+            logger.info(f"Embedded {len(_example_vectors)} labelled guardrail examples")
+
+    return _example_vectors
+
+
+def match_patterns(user_input: str) -> LocalVerdict | None:
+    for rule in PATTERN_TABLE:
+        if rule.pattern.search(user_input):
+            return LocalVerdict(
+                decision=rule.decision,
+                confidence=rule.confidence,
+                source="pattern",
+                speech=rule.speech,
+            )
+    return None
+
+
+def is_flagged_locally(user_input: str) -> bool:
+    """
+    Pattern pass only (no model, no embedding), for paths that answer before the
+    guardrail: True when the message matched a rule for anything but a course
+    or page question.
+    """
+    verdict = match_patterns(user_input)
+    return verdict is not None and verdict.decision not in (
+        GuardrailDecision.course_inquiry,
+        GuardrailDecision.page_inquiry,
+    )
+
+
+async def match_examples(user_input: str) -> LocalVerdict | None:
+    if len(user_input.split()) > EMBEDDING_MAX_WORDS:
+        return None
+
+    query_vector = await get_query_embedding(user_input)
+    examples = await load_example_vectors()
+
+    best: dict[GuardrailDecision, float] = {}
+    for decision, vector in examples:
+        score = cosine_similarity(query_vector, vector)
+        if score > best.get(decision, -1.0):
+            best[decision] = score
+
+    ranked = sorted(best.items(), key=lambda pair: pair[1], reverse=True)
+    if not ranked:
+        return None
+
+    decision, score = ranked[0]
+    runner_up = ranked[1][1] if len(ranked) > 1 else 0.0
+    if score - runner_up < EMBEDDING_MIN_MARGIN:
+        return None
+
+    return LocalVerdict(decision=decision, confidence=score, source="embedding")
+
+
+async def local_classify(user_input: str) -> LocalVerdict | None:
+    """Best local guess for the message, or None when nothing matched"""
+    verdict = match_patterns(user_input)
+    if verdict is not None or not PRECLASSIFIER_USE_EMBEDDINGS:
+        return verdict
+
+    try:
+        return await match_examples(user_input)
+    except Exception:
+        logger.exception("Embedding pre-classification failed")
+        return None
+
+
+async def preclassify(user_input: str) -> tuple[GuardrailAgentResponse | None, LocalVerdict | None]:
+    """
+    Returns a ready verdict when the LLM can be skipped, along with the raw
+    local verdict so shadow mode can compare it to the model afterwards.
+    """
+    if PRECLASSIFIER_MODE == PreClassifierMode.off:
+        return None, None
+
+    verdict = await local_classify(user_input)
+    category = verdict.decision.value if verdict else "NONE"
+    confident = verdict is not None and verdict.confidence >= PRECLASSIFIER_THRESHOLD
+
+    if PRECLASSIFIER_MODE == PreClassifierMode.on and confident:
+        PRECLASSIFIER_RESULTS.inc(category=category, outcome="hit")
+        return verdict.to_response(), verdict
+
+    PRECLASSIFIER_RESULTS.inc(
+        category=category,
+        outcome="shadow" if PRECLASSIFIER_MODE == PreClassifierMode.shadow else "fallback"
+    )
+    return None, verdict
+
+
+def record_shadow_result(user_input: str, verdict: LocalVerdict | None, llm_output: GuardrailAgentResponse):
+    if PRECLASSIFIER_MODE != PreClassifierMode.shadow or verdict is None:
+        return
+
+    agreement = "match" if verdict.decision == llm_output.guardrail_decision else "mismatch"
+    confident = verdict.confidence >= PRECLASSIFIER_THRESHOLD
+
+    PRECLASSIFIER_SHADOW.inc(
+        category=verdict.decision.value,
+        agreement=agreement,
+        confident=confident,
+    )
+    logger.info(
+        f"Shadow pre-classification {agreement}: local={verdict.decision.value} "
+        f"({verdict.source}, {verdict.confidence:.2f}) llm={llm_output.guardrail_decision.value} "
+        f"input={user_input[:80]!r}"
+    )
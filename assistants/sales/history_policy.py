@@ -0,0 +1,236 @@
+import asyncio
+import json
+import logging
+import os
+
+from agents import Agent, ModelSettings, Runner, TResponseInputItem
+from dotenv import load_dotenv
+
+from services import metrics
+from services.data_handler import count_item_tokens
+from services.redis_service import redis_client
+
+
+load_dotenv()
+
+
+logger = logging.getLogger("History Policy")
+
+
+HISTORY_POLICY_ENABLED = os.getenv("HISTORY_POLICY", 'True') == 'True'
+HISTORY_WINDOW_TURNS = int(os.getenv("HISTORY_WINDOW_TURNS", "6"))
+HISTORY_TOKEN_BUDGET = int(os.getenv("HISTORY_TOKEN_BUDGET", "6000"))
+# Turns that must fall out of the window before the summary is refreshed
+HISTORY_SUMMARY_BATCH_TURNS = int(os.getenv("HISTORY_SUMMARY_BATCH_TURNS", "2"))
+SUMMARY_TTL = 7 * 24 * 3600
+SUMMARY_LOCK_TTL = 60
+
+
+HISTORY_INPUT_TOKENS = metrics.histogram(
+    "history_input_tokens",
+    "Tokens of replayed history per request, before and after the history policy",
+    buckets=(250, 500, 1000, 2000, 4000, 6000, 8000, 16000, 32000)
+)
+SUMMARY_UPDATES = metrics.counter(
+    "history_summary_updates_total",
+    "Rolling summary refreshes by outcome"
+)
+
+
+def get_summary_instruction(ctx, agent):
+    return """
+You maintain a running summary of a chat between a learner and the Blue Academy pre-sales assistant.
+
+Merge the existing summary with the new conversation lines into one updated summary.
+Keep: courses discussed (titles and slugs), the learner's goals and preferences, contact details
+the learner shared (name, email, phone), leads already captured, and open questions.
+Drop greetings, filler and course details that can be looked up again.
+
+Write plain text, at most 150 words.
+"""
+
+
+class SummaryAgent(Agent):
+    def __init__(self):
+        super().__init__(
+            name="History Summary Agent",
+            instructions=get_summary_instruction,
+            model="gpt-4o-mini",
+            model_settings=ModelSettings(
+                temperature=0.2
+            )
+        )
+
+
+SUMMARY_AGENT = SummaryAgent()
+
+
+_background_tasks: set[asyncio.Task] = set()
+
+
+def summary_key(session_id: str) -> str:
+    return f"session:{session_id}:summary"
+
+
+def is_user_message(item: TResponseInputItem) -> bool:
+    return item.get("role") == "user"
+
+
+def get_turn_starts(items: list[TResponseInputItem]) -> list[int]:
+    """Indexes where a turn (a user message and everything after it) begins"""
+    return [index for index, item in enumerate(items) if is_user_message(item)]
+
+
+def render_item(item: TResponseInputItem) -> str | None:
+    """One readable line per item for the summarizer, tool payloads are left out"""
+    role = item.get("role")
+    content = item.get("content")
+
+    if role == "user":
+        return f"User: {content if isinstance(content, str) else json.dumps(content)}"
+
+    if role == "assistant":
+        text = content[0].get("text", "") if isinstance(content, list) and content else str(content)
+        try:
+            text = json.loads(text).get("speech", text)
+        except (json.JSONDecodeError, AttributeError):
+            pass
+        return f"Assistant: {text}"
+
+    if item.get("type") == "function_call":
+        return f"(Assistant called {item.get('name')} with {item.get('arguments')})"
+
+    return None
+
+
+async def load_summary(session_id: str) -> dict:
+    try:
+        cached = await redis_client.get(summary_key(session_id))
+    except Exception:
+        logger.exception("Failed to load rolling summary")
+        return {"summary": "", "covered": 0}
+
+    return json.loads(cached) if cached else {"summary": "", "covered": 0}
+
+
+async def update_summary(session_id: str, summary: dict, items: list[TResponseInputItem], covered: int):
+    lock_key = f"{summary_key(session_id)}:lock"
+    if not await redis_client.set(lock_key, "1", nx=True, ex=SUMMARY_LOCK_TTL):
+        return
+
+    try:
+        lines = [line for line in (render_item(item) for item in items) if line]
+        prompt = (
+            f"Existing summary:\n{summary['summary'] or '(none)'}\n\n"
+            f"New conversation lines:\n" + "\n".join(lines)
+        )
+        result = await Runner.run(SUMMARY_AGENT, prompt)
+
+        await redis_client.set(
+            summary_key(session_id),
+            json.dumps({"summary": str(result.final_output).strip(), "covered": covered}),
+            ex=SUMMARY_TTL
+        )
+        SUMMARY_UPDATES.inc(outcome="updated")
+        logger.info(f"Rolling summary for {session_id} now covers {covered} items")
+
+    except Exception:
+        SUMMARY_UPDATES.inc(outcome="error")
+        logger.exception(f"Rolling summary update failed for {session_id}")
+
+    finally:
+        await redis_client.delete(lock_key)
+
+
+def build_summary_item(summary: str) -> TResponseInputItem:
+    return {
+        "role": "system",
+        "content": f"Summary of the earlier conversation (older turns are not shown):\n{summary}",
+    }
+
+
+class HistoryPolicy:
+    """
+    `RunConfig.session_input_callback` that decides what part of the stored
+    history is replayed to the model:
+
+    - the last HISTORY_WINDOW_TURNS turns are kept verbatim
+    - older turns are replaced by a rolling summary kept in Redis and refreshed
+      in the background once enough turns have fallen out of the window
+    - the result is trimmed oldest-first to HISTORY_TOKEN_BUDGET tokens
+
+    The session itself is never modified, the full history stays available.
+    """
+
+    def __init__(self, session_id: str):
+        self.session_id = session_id
+
+    async def __call__(
+            self,
+            history: list[TResponseInputItem],
+            new_input: list[TResponseInputItem]
+    ) -> list[TResponseInputItem]:
+        tokens_before = sum(count_item_tokens(item) for item in history + new_input)
+
+        turn_starts = get_turn_starts(history)
+        window_start = turn_starts[-HISTORY_WINDOW_TURNS] if len(turn_starts) >= HISTORY_WINDOW_TURNS else 0
+
+        summary = {"summary": "", "covered": 0}
+        covered = 0
+        if window_start > 0:
+            summary = await load_summary(self.session_id)
+            covered = min(summary["covered"], window_start)
+
+            # Turns that left the window but are not in the summary yet are replayed verbatim
+            pending = history[covered:window_start]
+            pending_turns = sum(1 for item in pending if is_user_message(item))
+            if pending_turns >= HISTORY_SUMMARY_BATCH_TURNS:
+                task = asyncio.create_task(update_summary(self.session_id, summary, pending, window_start))
+                _background_tasks.add(task)
+                task.add_done_callback(_background_tasks.discard)
+
+        turns = self.split_turns(history[covered:]) + [new_input]
+        summary_items = [build_summary_item(summary["summary"])] if summary["summary"] else []
+
+        items = self.enforce_budget(summary_items, turns)
+        tokens_after = sum(count_item_tokens(item) for item in items)
+
+        HISTORY_INPUT_TOKENS.observe(tokens_before, stage="before")
+        HISTORY_INPUT_TOKENS.observe(tokens_after, stage="after")
+        logger.info(
+            f"History tokens for {self.session_id}: {tokens_before} -> {tokens_after} "
+            f"({len(history) + len(new_input)} -> {len(items)} items, summary covers {covered})"
+        )
+
+        return items
+
+    @staticmethod
+    def split_turns(items: list[TResponseInputItem]) -> list[list[TResponseInputItem]]:
+        turns: list[list[TResponseInputItem]] = []
+        for item in items:
+            if is_user_message(item) or not turns:
+                turns.append([])
+            turns[-1].append(item)
+        return turns
+
+    @staticmethod
+    def enforce_budget(
+            summary_items: list[TResponseInputItem],
+            turns: list[list[TResponseInputItem]]
+    ) -> list[TResponseInputItem]:
+        turn_tokens = [sum(count_item_tokens(item) for item in turn) for turn in turns]
+        summary_tokens = sum(count_item_tokens(item) for item in summary_items)
+
+        # Whole turns are dropped so tool calls never lose their outputs, the newest turn always stays
+        first_turn = 0
+        while first_turn < len(turns) - 1 and summary_tokens + sum(turn_tokens[first_turn:]) > HISTORY_TOKEN_BUDGET:
+            first_turn += 1
+
+        if summary_items and summary_tokens + sum(turn_tokens[first_turn:]) > HISTORY_TOKEN_BUDGET:
+            summary_items = []
+
+        return summary_items + [item for turn in turns[first_turn:] for item in turn]
+
+
+def get_history_policy(session_id: str) -> HistoryPolicy | None:
+    return HistoryPolicy(session_id) if HISTORY_POLICY_ENABLED else None
@@ -0,0 +1,143 @@
+import logging
+import os
+from dataclasses import dataclass
+
+import regex as re
+from agents import Usage
+from dotenv import load_dotenv
+
+from assistants.sales.guardrail_classifier import match_patterns
+from config import MODEL
+from model.output_schema import GuardrailDecision
+from services import metrics
+
+
+load_dotenv()
+
+
+logger = logging.getLogger("Model Router")
+
+
+# Without routing every run uses the agent's own (fast-cheap) model, metrics are still recorded per tier
+MODEL_ROUTING = os.getenv("MODEL_ROUTING", 'False') == 'True'
+# Session items from which a conversation counts as long
+MODEL_ROUTER_LONG_HISTORY = int(os.getenv("MODEL_ROUTER_LONG_HISTORY", "16"))
+# Requests with an X-Latency-SLO-Ms header below this always get the fast tier
+MODEL_ROUTER_FAST_SLO_MS = int(os.getenv("MODEL_ROUTER_FAST_SLO_MS", "3000"))
+
+FAST_TIER = "fast-cheap"
+COMPLEX_TIER = "Complex-Cheap"
+
+
+# USD per 1M tokens (input, output)
+MODEL_PRICES = {
+    "gpt-4o-mini": (0.15, 0.60),
+    "gpt-4.1-mini": (0.40, 1.60),
+}
+
+
+# Categories answered without tools or multi-step reasoning
+FAST_CATEGORIES = {
+    GuardrailDecision.page_inquiry,
+    GuardrailDecision.lead_information,
+    GuardrailDecision.greeting_or_small_talk,
+    GuardrailDecision.out_of_scope_general,
+    GuardrailDecision.out_of_scope_technical,
+}
+
+# Comparisons and recommendations need several tool results weighed against each other
+REASONING_PATTERN = re.compile(
+    r"\b(compare|comparison|difference|differ|vs|versus|better|best|recommend|suggest|which\s+(one|course)|"
+    r"roadmap|career|switch|beginner|suitable|right\s+for\s+me)\b",
+    flags=re.IGNORECASE
+)
+# Discovery questions that send the agent to the course search tool
+TOOL_HINT_PATTERN = re.compile(
+    r"\b(courses?|learn|topics?|skills?|syllabus|curriculum|modules?|programs?)\b",
+    flags=re.IGNORECASE
+)
+
+
+MODEL_ROUTER_DECISIONS = metrics.counter(
+    "model_router_decisions_total",
+    "Model tier picked per agent run, by tier and deciding signal"
+)
+MODEL_TIER_LATENCY = metrics.histogram(
+    "model_tier_latency_seconds",
+    "Agent run latency per model tier"
+)
+MODEL_TIER_COST = metrics.histogram(
+    "model_tier_cost_usd",
+    "Estimated agent run cost per model tier",
+    buckets=(0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025)
+)
+
+
+@dataclass
+class ModelRoute:
+    tier: str
+    model: str
+    reason: str
+
+
+def estimate_cost(model: str, usage: Usage) -> float:
+    input_price, output_price = MODEL_PRICES.get(model, (0.0, 0.0))
+    return (usage.input_tokens * input_price + usage.output_tokens * output_price) / 1_000_000
+
+
+def get_category(message: str, context_data: dict | None) -> GuardrailDecision | None:
+    """Cheap category guess, the guardrail's own verdict is not known before the agent starts"""
+    if (context_data or {}).get("trusted_action"):
+        return GuardrailDecision.lead_information
+
+    verdict = match_patterns(message)
+    return verdict.decision if verdict else None
+
+
+def pick_tier(
+        message: str,
+        context_data: dict | None,
+        history_items: int,
+        latency_slo_ms: int | None = None
+) -> tuple[str, str]:
+    if not MODEL_ROUTING:
+        return FAST_TIER, "disabled"
+
+    if latency_slo_ms is not None and latency_slo_ms < MODEL_ROUTER_FAST_SLO_MS:
+        return FAST_TIER, "latency_slo"
+
+    category = get_category(message, context_data)
+    if category in FAST_CATEGORIES:
+        return FAST_TIER, "category"
+
+    if REASONING_PATTERN.search(message):
+        return COMPLEX_TIER, "reasoning"
+
+    tools_likely = category == GuardrailDecision.course_inquiry or bool(TOOL_HINT_PATTERN.search(message))
+    if tools_likely and history_items >= MODEL_ROUTER_LONG_HISTORY:
+        return COMPLEX_TIER, "long_history"
+
+    return FAST_TIER, "default"
+
+
+async def route_model(
+        message: str,
+        session,
+        context_data: dict | None,
+        latency_slo_ms: int | None = None
+) -> ModelRoute:
+    history_items = 0
+    if MODEL_ROUTING:
+        history_items = len(await session.get_items(limit=MODEL_ROUTER_LONG_HISTORY))
+
+    tier, reason = pick_tier(message, context_data, history_items, latency_slo_ms)
+    MODEL_ROUTER_DECISIONS.inc(tier=tier, reason=reason)
+    if tier != FAST_TIER:
+        logger.info(f"Routed to {tier} ({reason})")
+
+    return ModelRoute(tier=tier, model=MODEL[tier], reason=reason)
+
+
+def record_tier_run(route: ModelRoute, seconds: float, usage: Usage):
+    MODEL_TIER_LATENCY.observe(seconds, tier=route.tier)
+    MODEL_TIER_COST.observe(estimate_cost(route.model, usage), tier=route.tier)
@@ -1,11 +1,15 @@
+import json
 import os
 from dotenv import load_dotenv
 from agents import Agent, RunContextWrapper, ModelSettings, ModelTracing, input_guardrail, InputGuardrail, InputGuardrailTripwireTriggered
 
-from assistants.sales.guardrail_agent import input_guardrail_agent
-from model.output_schema import PreSalesAgentResponseSchema, PreSalesCallAgentResponseSchema
+from config import MODEL
+from assistants.sales.guardrail_agent import input_guardrail_agent, GuardrailMode
+from model.output_schema import PreSalesAgentOutputSchema, PreSalesCallAgentResponseSchema, PreSalesSingleCallResponseSchema
 from model.input_schema import AgentContext
 from assistants.sales.tools import get_current_page_data_using_slug, get_similar_course_chunks, mark_user_lead
+from services.page_data_handler import get_prefetched_page_data
+from services.prompt_cache import prompt_cache_args
 
 
 load_dotenv()
@@ -20,30 +24,16 @@ model_settings = ModelSettings(
 model_tracing = ModelTracing(1)
 
 
-def get_dynamic_instruction(ctx: RunContextWrapper[AgentContext],
-                               agent: Agent):
-
-
-    page_context = ctx.context.get("page_context", {})
-    user_context = ctx.context.get("user_context", {"action": None, "course": None})
-
-    # Extract key values
-    page_slug = page_context.get("slug")
-    page_type = page_context.get("page_type")
-    user_action = user_context.get("action")
-    user_course = user_context.get("course", {})
-
-    system_instruction_concise = f"""
+# Kept byte-identical across requests so the provider can reuse it from the prompt cache,
+# everything request specific goes into the suffix built by get_dynamic_instruction
+PRE_SALES_INSTRUCTION = """
 You are a Blue Academy Assistant.
 
 Blue Academy is online learning platform which provide training and courses related to IT field.
 
 Your job is to answer user query related to courses provided by blue academy
 
-**CURRENT CONTENT**
-CONTEXT: Page: {page_type or 'unknown'} | Slug: {page_slug or 'N/A'} | Action: {user_action or "none"} | Course: {user_course.get('slug', 'none') if user_course else 'none'}
-
-You would be provided with slug of current page, along with user query and you have following tools that you can use for generating the query response.
+You would be provided with slug of current page in the CURRENT CONTEXT section at the end, along with user query and you have following tools that you can use for generating the query response.
 
 
 **TOOLS AVAILABLE**
@@ -57,7 +47,7 @@ With this tool utilize user's raw query to fetch relevant information from the k
 Tool 3: mark_user_lead - utilize this tool to capture leads
 Use this tool in case if user is showing interest in particular course (Given user intent is Not Course Inquiry) + all fields valid
 #Validation: email has @, phone has +, name 2+ chars
-#Input: LeadDetails(name, email, contact, course_slug='{user_course.get('slug', '') if user_course else 'none'}')
+#Input: LeadDetails(name, email, contact, course_slug=Course from CURRENT CONTEXT)
 #Output: Send output to user accordingly.
 #Limit: ONCE per user query (no retry unnecessarily)
 
@@ -79,23 +69,73 @@ Decline → "No problem!" → STOP
 
 ##RESPONSE FORMAT##
 
-{{
+{
   "speech": "Natural spoken response (no markdown)",
   "intent": "general_chat" | "course_inquiry" | "course_discovery" | "lead_capture",
   "confidence": "low" | "medium" | "high",
   "actions": [
-    {{
-      "type": "details" | "interest",
-      "label": "View Details: [Course]" | "I'm interested in [Course]",
-      "course": {{"id": "uuid", "title": "Title", "slug": "slug"}}
-    }}
+    {"type": "details" | "interest", "slug": "course-slug"}
   ]
-}}
+}
+Action slugs must be copied exactly from the tool results, button labels are added for you.
+
+"""
+
+
+# Appended to the static prefix when the agent also does the guardrail's job (GuardrailMode.single_call)
+CLASSIFICATION_INSTRUCTION = """
+**CLASSIFICATION**
+
+Before answering, set guardrail_decision for the latest user message:
+- COURSE_INQUIRY: any question or interest about courses, topics or skills, pricing, duration, curriculum, prerequisites
+- PAGE_INQUIRY: website navigation, finding pages, login, resources
+- LEAD_INFORMATION: contact details, enrollment or consultation requests, a name given while you are collecting contact details
+- GREETING_SMALLTALK: greetings, thanks and small talk only
+- OUT_OF_SCOPE_TECHNICAL: debugging or fixing code, or explaining a technical concept that is not about a course's details
+- OUT_OF_SCOPE_GENERAL: non-educational topics (weather, sports, news, gossip)
+- UNKNOWN: genuinely unclear or gibberish
+
+COURSE_INQUIRY, PAGE_INQUIRY, LEAD_INFORMATION: answer as described above.
+Every other category: do not call any tool, reply in 1-2 sentences (greet back, refocus on courses or ask for clarification) and return no actions.
 
+"""
+
+
+def get_static_instruction(guardrail_mode: GuardrailMode | None) -> str:
+    if guardrail_mode == GuardrailMode.single_call:
+        return PRE_SALES_INSTRUCTION + CLASSIFICATION_INSTRUCTION
+    return PRE_SALES_INSTRUCTION
+
+
+async def get_dynamic_instruction(ctx: RunContextWrapper[AgentContext],
+                               agent: Agent):
+
+
+    page_context = ctx.context.get("page_context", {})
+    user_context = ctx.context.get("user_context", {"action": None, "course": None})
 
+    # Extract key values
+    page_slug = page_context.get("slug")
+    page_type = page_context.get("page_type")
+    user_action = user_context.get("action")
+    user_course = user_context.get("course", {})
+
+    # Page data stays the same for every turn on a page, so it goes before the context line
+    dynamic_suffix = ""
+    prefetched_page_data = await get_prefetched_page_data(ctx.context, page_slug)
+    if prefetched_page_data:
+        dynamic_suffix += f"""
+**CURRENT PAGE DATA**
+Already fetched for slug '{page_slug}'. Answer from this directly, do not call get_current_page_data_using_slug for this page.
+{json.dumps(prefetched_page_data, default=str)}
 """
 
-    return system_instruction_concise
+    dynamic_suffix += f"""
+**CURRENT CONTEXT**
+CONTEXT: Page: {page_type or 'unknown'} | Slug: {page_slug or 'N/A'} | Action: {user_action or "none"} | Course: {user_course.get('slug', 'none') if user_course else 'none'}
+"""
+
+    return get_static_instruction(getattr(agent, "guardrail_mode", None)) + dynamic_suffix
 
 # def get_dynamic_instruction(ctx: RunContextWrapper[AgentContext],
 #                                agent: Agent):
@@ -598,20 +638,24 @@ Tell them to feel free to reach and they can ask for any other kind of help.
 
 
 class PreSalesAgent(Agent):
-    def __init__(self):
+    def __init__(self, guardrail_mode: GuardrailMode = GuardrailMode.sequential):
         super().__init__(
         name="Pre Sales Agent",
         instructions=get_dynamic_instruction,
         tools=[get_current_page_data_using_slug,
                get_similar_course_chunks,
                mark_user_lead],
-        output_type=PreSalesAgentResponseSchema,
-        model="gpt-4o-mini",
+        output_type=PreSalesSingleCallResponseSchema if guardrail_mode == GuardrailMode.single_call else PreSalesAgentOutputSchema,
+        model=MODEL["fast-cheap"],
         model_settings=ModelSettings(
-            verbosity="medium"
+            verbosity="medium",
+            extra_args=prompt_cache_args("Pre Sales Agent", get_static_instruction(guardrail_mode))
         ),
-        input_guardrails=[input_guardrail_agent]
+        # Speculative mode runs the guardrail next to the agent from the route instead,
+        # single-call mode classifies inside the agent's own output
+        input_guardrails=[input_guardrail_agent] if guardrail_mode == GuardrailMode.sequential else []
     )
+        self.guardrail_mode = guardrail_mode
 
 
 class PreSalesCallAgent(Agent):
@@ -621,11 +665,13 @@ class PreSalesCallAgent(Agent):
             instructions=get_dynamic_instruction_v2,
             tools=[get_similar_course_chunks],
             output_type=PreSalesCallAgentResponseSchema,
-            model="gpt-4o-mini",
+            model=MODEL["fast-cheap"],
             model_settings=ModelSettings(
-                verbosity="medium"
+                verbosity="medium",
+                extra_args=prompt_cache_args("Pre Sales Call Agent", get_dynamic_instruction_v2(None, None))
             )
         )
+        self.guardrail_mode = None
 
 
 
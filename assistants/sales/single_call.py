@@ -0,0 +1,199 @@
+import asyncio
+import json
+import logging
+import statistics
+import sys
+import time
+
+from agents import Agent, RunConfig, RunHooks, Runner, RunResult, Usage
+
+from assistants.sales.canned_responses import apply_canned_speech
+from assistants.sales.guardrail_agent import (
+    GUARDRAIL_AGENT,
+    GuardrailMode,
+    build_guardrail_tripwire,
+    get_page_title,
+    get_trusted_action_verdict
+)
+from assistants.sales.model_router import estimate_cost
+from assistants.sales.pre_sales_agent import PreSalesAgent
+from model.output_schema import GuardrailAgentResponse, GuardrailCategoryResponse, PreSalesSingleCallResponseSchema
+from services import metrics
+from services.prompt_cache import record_run_usage
+from services.session_handler import BufferedSession
+
+
+logger = logging.getLogger("Single Call")
+
+
+SINGLE_CALL_RUNS = metrics.counter(
+    "single_call_runs_total",
+    "Single-call pre-sales runs by the guardrail decision the agent returned"
+)
+
+
+def get_guardrail_output(output: PreSalesSingleCallResponseSchema, context: dict | None) -> GuardrailAgentResponse | None:
+    """Verdict carried by a single-call answer, `None` when the message is routed to the agent"""
+    SINGLE_CALL_RUNS.inc(decision=output.guardrail_decision.value)
+    if get_trusted_action_verdict(context) is not None:
+        return None
+
+    guardrail_output = output.to_guardrail_response()
+    if not guardrail_output.is_guardrail_output_triggered:
+        return None
+
+    return apply_canned_speech(guardrail_output, get_page_title(context))
+
+
+def allows_streamed_speech(decision: str, context: dict | None) -> bool:
+    """
+    Whether speech streamed after this `guardrail_decision` may reach the client.
+    The schema puts the decision first, so it is known before any speech arrives.
+    """
+    if get_trusted_action_verdict(context) is not None:
+        return True
+
+    try:
+        verdict = GuardrailAgentResponse(guardrail_decision=decision, reason="")
+    except ValueError:
+        return False
+
+    return not verdict.is_guardrail_output_triggered
+
+
+async def run_single_call(
+        agent: Agent,
+        message: str,
+        session,
+        context: dict,
+        run_config: RunConfig,
+        hooks: RunHooks | None = None
+) -> RunResult:
+    """
+    Run the pre-sales agent in single-call mode. The answer is buffered until
+    its guardrail decision is known, a non-routed decision rolls it back (the
+    user input is kept) and raises the usual `InputGuardrailTripwireTriggered`.
+    """
+    buffered_session = BufferedSession(session)
+
+    try:
+        result = await Runner.run(
+            agent,
+            message,
+            session=buffered_session,
+            context=context,
+            run_config=run_config,
+            hooks=hooks
+        )
+    except BaseException:
+        await buffered_session.rollback()
+        raise
+
+    guardrail_output = get_guardrail_output(result.final_output, context)
+    if guardrail_output is not None:
+        await buffered_session.rollback()
+        record_run_usage(agent.name, result.context_wrapper.usage)
+        raise build_guardrail_tripwire(guardrail_output)
+
+    await buffered_session.commit()
+    return result
+
+
+async def run_two_call(message: str, context: dict, agent: Agent) -> dict:
+    start_time = time.perf_counter()
+    guardrail_result = await Runner.run(GUARDRAIL_AGENT, message, context=None)
+    guardrail_output = guardrail_result.final_output
+    if isinstance(guardrail_output, GuardrailCategoryResponse):
+        guardrail_output = guardrail_output.to_response()
+
+    usage = Usage()
+    usage.add(guardrail_result.context_wrapper.usage)
+    cost = estimate_cost(GUARDRAIL_AGENT.model, guardrail_result.context_wrapper.usage)
+
+    if not guardrail_output.is_guardrail_output_triggered:
+        agent_result = await Runner.run(agent, message, context=context)
+        usage.add(agent_result.context_wrapper.usage)
+        cost += estimate_cost(agent.model, agent_result.context_wrapper.usage)
+
+    return {
+        "decision": guardrail_output.guardrail_decision.value,
+        "routed": not guardrail_output.is_guardrail_output_triggered,
+        "seconds": time.perf_counter() - start_time,
+        "input_tokens": usage.input_tokens,
+        "output_tokens": usage.output_tokens,
+        "cost": cost,
+    }
+
+
+async def run_one_call(message: str, context: dict, agent: Agent) -> dict:
+    start_time = time.perf_counter()
+    result = await Runner.run(agent, message, context=context)
+    usage = result.context_wrapper.usage
+
+    return {
+        "decision": result.final_output.guardrail_decision.value,
+        "routed": not result.final_output.to_guardrail_response().is_guardrail_output_triggered,
+        "seconds": time.perf_counter() - start_time,
+        "input_tokens": usage.input_tokens,
+        "output_tokens": usage.output_tokens,
+        "cost": estimate_cost(agent.model, usage),
+    }
+
+
+def summarize_mode(runs: list[dict]) -> dict:
+    seconds = sorted(run["seconds"] for run in runs)
+    return {
+        "p50_seconds": round(statistics.median(seconds), 3),
+        "p95_seconds": round(seconds[min(len(seconds) - 1, int(len(seconds) * 0.95))], 3),
+        "mean_input_tokens": round(statistics.mean(run["input_tokens"] for run in runs), 1),
+        "mean_output_tokens": round(statistics.mean(run["output_tokens"] for run in runs), 1),
+        "total_cost_usd": round(sum(run["cost"] for run in runs), 6),
+    }
+
+
+async def compare_modes(samples: list[dict]) -> dict:
+    """
+    Offline comparison of the two-call (guardrail then agent) and single-call
+    modes on samples of `{"message", "context"}`.
+    Runs against the live model, without sessions.
+    """
+    two_call_agent = PreSalesAgent(guardrail_mode=GuardrailMode.speculative)
+    one_call_agent = PreSalesAgent(guardrail_mode=GuardrailMode.single_call)
+
+    two_call_runs, one_call_runs, disagreements = [], [], []
+    for sample in samples:
+        message, context = sample["message"], sample.get("context") or {}
+        two_call = await run_two_call(message, context, two_call_agent)
+        one_call = await run_one_call(message, context, one_call_agent)
+        two_call_runs.append(two_call)
+        one_call_runs.append(one_call)
+
+        if two_call["decision"] != one_call["decision"]:
+            disagreements.append({
+                "message": message,
+                "two_call": two_call["decision"],
+                "one_call": one_call["decision"],
+            })
+
+    routing_agreement = sum(
+        two_call["routed"] == one_call["routed"]
+        for two_call, one_call in zip(two_call_runs, one_call_runs)
+    )
+
+    return {
+        "samples": len(samples),
+        "two_call": summarize_mode(two_call_runs),
+        "one_call": summarize_mode(one_call_runs),
+        "decision_agreement": round(1 - len(disagreements) / len(samples), 3),
+        "routing_agreement": round(routing_agreement / len(samples), 3),
+        "disagreements": disagreements,
+    }
+
+
+if __name__ == "__main__":
+    # Corpus: one {"message": ..., "context": {...}} object per line
+    #   python -m assistants.sales.single_call samples.jsonl
+    with open(sys.argv[1]) as corpus:
+        loaded = [json.loads(line) for line in corpus if line.strip()]
+
+    print(json.dumps(asyncio.run(compare_modes(loaded)), indent=2))
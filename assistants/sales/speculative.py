@@ -0,0 +1,153 @@
+import asyncio
+import logging
+import time
+
+from agents import Agent, RunConfig, RunContextWrapper, RunHooks, Runner, RunResult
+from agents.items import ModelResponse
+
+from assistants.sales.guardrail_agent import classify_session_input, build_guardrail_tripwire
+from model.output_schema import GuardrailAgentResponse
+from services import metrics
+from services.session_handler import BufferedSession
+
+
+logger = logging.getLogger("Speculative Guardrail")
+
+
+SPECULATIVE_RUNS = metrics.counter(
+    "speculative_runs_total",
+    "Main agent runs started next to the guardrail, by outcome"
+)
+SPECULATIVE_WASTED_SECONDS = metrics.histogram(
+    "speculative_wasted_seconds",
+    "Main agent runtime thrown away after a guardrail tripwire"
+)
+SPECULATIVE_WASTED_TOKENS = metrics.counter(
+    "speculative_wasted_tokens_total",
+    "Tokens spent by main agent runs that were cancelled after a guardrail tripwire"
+)
+SPECULATIVE_WASTED_REQUESTS = metrics.counter(
+    "speculative_wasted_model_requests_total",
+    "Model requests completed by main agent runs that were cancelled"
+)
+ABANDONED_RUNS_SECONDS = metrics.histogram(
+    "abandoned_run_seconds",
+    "Agent runtime spent before the run was cancelled because the client disconnected"
+)
+ABANDONED_RUNS_TOKENS = metrics.counter(
+    "abandoned_run_tokens_total",
+    "Tokens spent by agent runs cancelled because the client disconnected"
+)
+ABANDONED_RUNS_REQUESTS = metrics.counter(
+    "abandoned_run_model_requests_total",
+    "Model requests completed by agent runs cancelled because the client disconnected"
+)
+
+
+class UsageTrackingHooks(RunHooks):
+    """Accumulates model usage as each LLM call returns, so it survives task cancellation"""
+
+    def __init__(self):
+        self.requests = 0
+        self.input_tokens = 0
+        self.output_tokens = 0
+
+    async def on_llm_end(
+            self,
+            context: RunContextWrapper,
+            agent: Agent,
+            response: ModelResponse
+    ) -> None:
+        self.requests += 1
+        self.input_tokens += response.usage.input_tokens
+        self.output_tokens += response.usage.output_tokens
+
+
+async def cancel_task(task: asyncio.Task):
+    task.cancel()
+    await asyncio.gather(task, return_exceptions=True)
+
+
+def record_cancelled_run(usage: UsageTrackingHooks, start_time: float):
+    elapsed = time.perf_counter() - start_time
+
+    SPECULATIVE_RUNS.inc(outcome="cancelled")
+    SPECULATIVE_WASTED_SECONDS.observe(elapsed)
+    SPECULATIVE_WASTED_TOKENS.inc(usage.input_tokens, direction="input")
+    SPECULATIVE_WASTED_TOKENS.inc(usage.output_tokens, direction="output")
+    SPECULATIVE_WASTED_REQUESTS.inc(usage.requests)
+
+    logger.info(
+        f"Cancelled speculative run after {elapsed:.3f}s "
+        f"({usage.requests} requests, {usage.input_tokens} input / {usage.output_tokens} output tokens)"
+    )
+
+
+def record_abandoned_run(usage: UsageTrackingHooks, start_time: float):
+    elapsed = time.perf_counter() - start_time
+
+    ABANDONED_RUNS_SECONDS.observe(elapsed)
+    ABANDONED_RUNS_TOKENS.inc(usage.input_tokens, direction="input")
+    ABANDONED_RUNS_TOKENS.inc(usage.output_tokens, direction="output")
+    ABANDONED_RUNS_REQUESTS.inc(usage.requests)
+
+    logger.info(
+        f"Abandoned run after {elapsed:.3f}s, client disconnected "
+        f"({usage.requests} requests, {usage.input_tokens} input / {usage.output_tokens} output tokens)"
+    )
+
+
+async def run_with_speculative_guardrail(
+        agent: Agent,
+        message: str,
+        session,
+        context: dict,
+        run_config: RunConfig,
+        hooks: UsageTrackingHooks | None = None
+) -> RunResult:
+    """
+    Start the guardrail classifier and the main agent at the same time.
+
+    The agent writes into a `BufferedSession`, so nothing reaches the real
+    session until the guardrail has passed. On a tripwire the agent task is
+    cancelled, its buffered items are dropped (the user input is kept) and
+    the usual `InputGuardrailTripwireTriggered` is raised.
+    """
+
+    buffered_session = BufferedSession(session)
+    usage = hooks or UsageTrackingHooks()
+    start_time = time.perf_counter()
+
+    agent_task = asyncio.create_task(
+        Runner.run(
+            agent,
+            message,
+            session=buffered_session,
+            context=context,
+            run_config=run_config,
+            hooks=usage
+        )
+    )
+
+    try:
+        guardrail_output: GuardrailAgentResponse = await classify_session_input(message, session, context)
+    except BaseException:
+        await cancel_task(agent_task)
+        raise
+
+    if guardrail_output.is_guardrail_output_triggered:
+        await cancel_task(agent_task)
+        await buffered_session.rollback()
+        record_cancelled_run(usage, start_time)
+        raise build_guardrail_tripwire(guardrail_output)
+
+    try:
+        response = await agent_task
+    except BaseException:
+        await buffered_session.rollback()
+        raise
+
+    await buffered_session.commit()
+    SPECULATIVE_RUNS.inc(outcome="committed")
+
+    return response
@@ -1,9 +1,12 @@
+import asyncio
+
 from pydantic import Field, BaseModel, field_validator
 
-from model.input_schema import LeadDetails
+from model.input_schema import LeadDetails, AgentContext
 from services import similarity
-from services.page_data_handler import resolve_page_data_by_slug
-from agents import function_tool
+from services.deadline import get_tool_budget, run_stage
+from services.page_data_handler import resolve_page_data_by_slug, get_prefetched_page_data
+from agents import function_tool, RunContextWrapper
 from services.mongo_db import mark_course_lead
 from services.weaviate_service import fetch_weaviate_object
 
@@ -28,8 +31,14 @@ async def get_current_page_details(slug : str)->dict:
     }
 
 
+# Degraded tool results when the request deadline leaves no time for the lookup
+SEARCH_TIMEOUT_NOTICE = "Course search is unavailable right now. Answer from the conversation so far or ask the user to try again shortly."
+PAGE_DATA_TIMEOUT_NOTICE = "Page data is unavailable right now. Answer from the conversation so far or ask the user to try again shortly."
+LEAD_TIMEOUT_NOTICE = "The user's details were received and are still being saved. Tell the user the team will follow up."
+
+
 @function_tool(name_override="get_similar_course_chunks")
-async def get_similar_course_chunks(query: str)->list[dict]:
+async def get_similar_course_chunks(ctx: RunContextWrapper[AgentContext], query: str)->list[dict]:
     """
     This function is used to get similar courses based on a query text input.
     :param query: The query string including important keywords to get similar courses chunks.
@@ -37,22 +46,41 @@ async def get_similar_course_chunks(query: str)->list[dict]:
     List of similar courses along with their details
     """
 
+    try:
+        result = await run_stage(
+            "get_similar_course_chunks",
+            similarity.get_similar_course_chunks(query),
+            get_tool_budget(ctx.context)
+        )
+    except asyncio.TimeoutError:
+        return [{"notice": SEARCH_TIMEOUT_NOTICE}]
 
-    result = await similarity.get_similar_course_chunks(query)
     return result
 
 
 
 
 @function_tool(name_override="get_current_page_data_using_slug")
-async def get_current_page_data_using_slug(slug: str) -> dict:
+async def get_current_page_data_using_slug(ctx: RunContextWrapper[AgentContext], slug: str) -> dict:
     """
     Fetch current page data by slug.
     Read Only
     Args: slug.
     Returns dict:
     """
-    page_data, _ = await resolve_page_data_by_slug(slug)
+    prefetched = await get_prefetched_page_data(ctx.context, slug)
+    if prefetched:
+        return prefetched
+
+    try:
+        page_data, _ = await run_stage(
+            "get_current_page_data_using_slug",
+            resolve_page_data_by_slug(slug),
+            get_tool_budget(ctx.context)
+        )
+    except asyncio.TimeoutError:
+        return {"notice": PAGE_DATA_TIMEOUT_NOTICE}
+
     return page_data or {}
 
 
@@ -62,6 +90,7 @@ async def get_current_page_data_using_slug(slug: str) -> dict:
 
 @function_tool(name_override="mark_user_lead")
 async def mark_user_lead(
+        ctx: RunContextWrapper[AgentContext],
         details: LeadDetails,
 ) -> str:
     """
@@ -99,13 +128,22 @@ async def mark_user_lead(
 
 
 
-    result = await mark_course_lead(
-        course_slug=details.slug,
-        user_payload={
-        "name": details.name,
-        "email": details.email,
-        "contact": details.contact,
-    })
+    # The write is shielded, a lead that is slow to save is still saved
+    try:
+        result = await run_stage(
+            "mark_user_lead",
+            mark_course_lead(
+                course_slug=details.slug,
+                user_payload={
+                "name": details.name,
+                "email": details.email,
+                "contact": details.contact,
+            }),
+            get_tool_budget(ctx.context),
+            shield=True
+        )
+    except asyncio.TimeoutError:
+        return LEAD_TIMEOUT_NOTICE
 
     if type(result) == str:
         return result
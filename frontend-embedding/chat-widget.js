@@ -1194,6 +1194,8 @@
           slug: courseSlug,
           title: courseTitle
         }
+        // Single use: lets this click skip the guardrail on the server
+        userContext.action_token = act?.token || null
         await sendMessage();
         break;
 
@@ -1205,6 +1207,33 @@
 
 
 
+  function newIdempotencyKey() {
+    if (window.crypto?.randomUUID) return window.crypto.randomUUID();
+    return `${Date.now().toString(36)}-${Math.random().toString(36).slice(2)}`;
+  }
+
+
+  async function postChat(payload, idempotencyKey, retries = 1) {
+    for (let attempt = 0; ; attempt++) {
+      try {
+        const res = await fetch(CHAT_API, {
+          method: "POST",
+          headers: {
+            "Content-Type": "application/json",
+            "ngrok-skip-browser-warning": "true",
+            "Idempotency-Key": idempotencyKey
+          },
+          body: JSON.stringify(payload)
+        });
+        if (res.status < 500 || attempt >= retries) return res;
+      } catch (err) {
+        if (attempt >= retries) throw err;
+      }
+      await new Promise(r => setTimeout(r, 500));
+    }
+  }
+
+
   async function sendMessage() {
     if (isProcessing) return;
 
@@ -1224,19 +1253,16 @@
       session_id: sessionId,
       context: {
         page_context: getPageContext(),
-        user_context: userContext
+        user_context: { ...userContext }
       }
     }
+    delete userContext.action_token;
+
+    // One key per message, sent again only when the same request is retried
+    const idempotencyKey = newIdempotencyKey();
 
     try {
-      const res = await fetch(CHAT_API, {
-        method: "POST",
-        headers: {
-          "Content-Type": "application/json",
-          "ngrok-skip-browser-warning": "true"
-        },
-        body: JSON.stringify(payload)
-      });
+      const res = await postChat(payload, idempotencyKey);
 
       if (res.status === 409) {
         hideTyping();
@@ -15,9 +15,12 @@ from route import agent_route, internal_route
 from services.auth_middleware import LogMiddleware
 from fastapi.staticfiles import StaticFiles
 
+from services.openai_client import init_openai_client, warm_up_openai_client, close_openai_client
 from services.postgres_db import init_async_engine, dispose_async_engine
 from services.redis_service import disconnect_redis
+from services.tiered_cache import start_cache_invalidation, stop_cache_invalidation
 from services.sqlite_db import init_sqlite, init_sqlite_db, close_sqlite
+from services.vector_index import load_vector_index
 from services.weaviate_service import init_weaviate, close_weaviate
 
 BASE_DIR = Path(__file__).resolve().parent
@@ -40,6 +43,7 @@ async def lifespan(app: FastAPI):
         )]
     )
 
+    init_openai_client()
     await init_weaviate()
     init_sqlite(SQLITE_DB_PATH)
     init_sqlite_db()
@@ -49,11 +53,16 @@ async def lifespan(app: FastAPI):
         max_overflow=20,
         echo=False
     )
+    await warm_up_openai_client()
+    await load_vector_index()
+    start_cache_invalidation()
     yield
+    await stop_cache_invalidation()
     await disconnect_redis()
     await close_weaviate()
     close_sqlite()
     await dispose_async_engine()
+    await close_openai_client()
 
 
 
@@ -113,6 +113,8 @@ class PageContext(BaseModel):
 class UserContext(BaseModel):
     action: Optional[str] = None
     course: Optional[CourseRef] = None
+    # Signed token of the AgentAction button that produced this message
+    action_token: Optional[str] = None
 
 
 class AgentContext(BaseModel):
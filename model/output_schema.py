@@ -26,6 +26,11 @@ class AgentAction(BaseModel):
     course: CourseRef
 
 
+class ActionRef(BaseModel):
+    type: Literal["details", "interest"] = Field(title="Action Type", description="The type of UI component to render.")
+    slug: str = Field(description="Slug of the course the button is for, exactly as returned by the tools")
+
+
 class PreSalesAgentResponseSchema(BaseModel):
     speech: str = Field(title="Agent Response", description="The natural language response to be spoken or read by the user")
     intent: str = Field(title="Intent", description="The classified user intent")
@@ -35,6 +40,39 @@ class PreSalesAgentResponseSchema(BaseModel):
         description="A list of suggested next steps or interactive buttons for the user.")
 
 
+class PreSalesAgentOutputSchema(BaseModel):
+    """Model-facing pre-sales answer, actions are expanded into `AgentAction` on the server"""
+    speech: str = Field(title="Agent Response", description="The natural language response to be spoken or read by the user")
+    intent: str = Field(title="Intent", description="The classified user intent")
+    confidence: Literal["low", "medium", "high"] = Field(title="Intent Certainty Score", description="The model's certainty in its intent classification.")
+    actions: Optional[List[ActionRef]] = Field(
+        default=[],
+        description="A list of suggested next steps or interactive buttons for the user.")
+
+
+class PreSalesSingleCallResponseSchema(BaseModel):
+    """Pre-sales answer that also carries the guardrail classification, used when both run in one call"""
+    guardrail_decision: GuardrailDecision = Field(
+        description="Classification of the latest user message"
+    )
+    speech: str = Field(title="Agent Response", description="The natural language response to be spoken or read by the user")
+    intent: str = Field(title="Intent", description="The classified user intent")
+    confidence: Literal["low", "medium", "high"] = Field(title="Intent Certainty Score", description="The model's certainty in its intent classification.")
+    actions: Optional[List[ActionRef]] = Field(
+        default=[],
+        description="A list of suggested next steps or interactive buttons for the user.")
+
+    def to_agent_output(self) -> PreSalesAgentOutputSchema:
+        return PreSalesAgentOutputSchema.model_validate(self.model_dump(exclude={"guardrail_decision"}))
+
+    def to_guardrail_response(self) -> "GuardrailAgentResponse":
+        return GuardrailAgentResponse(
+            guardrail_decision=self.guardrail_decision,
+            reason="Single-call classification",
+            speech=self.speech
+        )
+
+
 class PreSalesCallAgentResponseSchema(BaseModel):
     speech: str = Field(title="Speech", description="The natural language response to be spoken or read by the user")
 
@@ -64,6 +102,20 @@ class GuardrailAgentResponse(BaseModel):
         ]
 
 
+class GuardrailCategoryResponse(BaseModel):
+    """Category-only guardrail classification, speech is filled in from canned templates"""
+    guardrail_decision: GuardrailDecision = Field(
+        description="Classification of user intent"
+    )
+
+    def to_response(self) -> GuardrailAgentResponse:
+        return GuardrailAgentResponse(
+            guardrail_decision=self.guardrail_decision,
+            reason="Category-only classification",
+            speech=""
+        )
+
+
 OUTPUT_SCHEMA ={
   "title": "PreSalesAgentResponseSchema",
   "type": "object",
@@ -1,3 +1,4 @@
+import asyncio
 import inspect
 import json
 import os
@@ -5,19 +6,60 @@ import logging
 import uuid
 from agents import Runner, SQLiteSession, RunConfig, InputGuardrailTripwireTriggered, InputGuardrailResult
 from agents.extensions.memory import SQLAlchemySession
-from fastapi import APIRouter, HTTPException
-from fastapi.responses import JSONResponse
-
-from assistants.sales.guardrail_agent import GuardrailAgent, build_guardrail_message
+import numpy as np
+from fastapi import APIRouter, Header, HTTPException, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+from assistants.sales.action_enrichment import enrich_history, enrich_response
+from assistants.sales.fact_resolver import resolve_fact_question
+from assistants.sales.guardrail_agent import (
+    GuardrailAgent,
+    GuardrailMode,
+    build_guardrail_message,
+    build_guardrail_tripwire,
+    classify_session_input
+)
+from assistants.sales.guardrail_classifier import is_flagged_locally
+from assistants.sales.history_policy import get_history_policy
+from assistants.sales.model_router import record_tier_run, route_model
 from assistants.sales.pre_sales_agent import PreSalesAgent, PreSalesCallAgent
+from assistants.sales.single_call import allows_streamed_speech, get_guardrail_output, run_single_call
+from assistants.sales.speculative import (
+    SPECULATIVE_RUNS,
+    UsageTrackingHooks,
+    cancel_task,
+    record_abandoned_run,
+    record_cancelled_run,
+    run_with_speculative_guardrail
+)
 from uuid import uuid4, uuid5
 import time
 from model.input_schema import ChatPayload
-from model.output_schema import PreSalesAgentResponseSchema, PreSalesCallAgentResponseSchema, GuardrailAgentResponse
+from model.output_schema import (
+    GuardrailAgentResponse,
+    PreSalesAgentOutputSchema,
+    PreSalesAgentResponseSchema,
+    PreSalesCallAgentResponseSchema,
+    PreSalesSingleCallResponseSchema
+)
+from services.action_token import sign_reply_actions, verify_action_token
+from services.answer_cache import (
+    build_answer_items,
+    get_cacheable_slug,
+    is_cacheable_reply,
+    is_context_free_turn,
+    lookup_answer,
+    store_answer
+)
 from services.data_handler import clean_chat, clean_speech_output
-from services.page_data_handler import extract_page_info_from_url
-from services.redis_service import redis_client
-from services.session_handler import SessionManager
+from services.deadline import build_timeout_reply, get_deadline, get_remaining, record_stage, run_stage
+from services.idempotency import get_stored_reply, replay_or_run, store_reply
+from services.model_hedging import get_model_provider
+from services.page_data_handler import extract_page_info_from_url, start_page_prefetch, record_prefetch_usage
+from services.prompt_cache import record_run_usage
+from services.session_handler import SessionManager, BufferedSession
+from services.session_queue import ClientDisconnectedError, SessionBusyError, run_in_session_queue, session_turn
+from services.stream_handler import GUARDRAIL_DECISION_KEY, SpeechStreamExtractor, format_sse
 
 logger = logging.getLogger("Agent Handler")
 
@@ -32,27 +74,30 @@ router = APIRouter(
 
 
 DEV_MODE = os.getenv("DEV_MODE", 'False') == 'True'
+GUARDRAIL_MODE = GuardrailMode(os.getenv("GUARDRAIL_MODE", GuardrailMode.sequential.value))
 
 GUARDRAIL_AGENT = GuardrailAgent()
-PRE_SALES_AGENT = PreSalesAgent()
+# One agent per guardrail mode, the X-Guardrail-Mode header picks one per request
+PRE_SALES_AGENTS = {mode: PreSalesAgent(guardrail_mode=mode) for mode in GuardrailMode}
+PRE_SALES_AGENT = PRE_SALES_AGENTS[GUARDRAIL_MODE]
 PRE_SALES_CALL_AGENT = PreSalesCallAgent()
 
 
-LOCK_TIMEOUT = 60        # max agent runtime
-BLOCKING_TIMEOUT = 0     # short wait
 SESSION_INFLIGHT_TTL = 90
 SESSION_TTL = 30*60
 SESSIONS = {}
 
 
-def get_agent_config(context):
+def get_agent_config(context, guardrail_mode: GuardrailMode | None = None):
     if not context:
         return PRE_SALES_CALL_AGENT,PreSalesCallAgentResponseSchema
-    return PRE_SALES_AGENT,PreSalesAgentResponseSchema
+    return PRE_SALES_AGENTS[guardrail_mode or GUARDRAIL_MODE],PreSalesAgentResponseSchema
 
 
-def build_run_config(session_id: str) -> RunConfig:
+def build_run_config(session_id: str, model: str | None = None) -> RunConfig:
     return RunConfig(
+        model=model,
+        model_provider=get_model_provider(),
         workflow_name="Pre-sales chatbot",
         group_id=session_id,
         trace_metadata={
@@ -61,9 +106,71 @@ def build_run_config(session_id: str) -> RunConfig:
             "source": "chat-widget",
         },
         trace_include_sensitive_data=True,
+        session_input_callback=get_history_policy(session_id),
+    )
+
+
+async def run_agent(
+        agent,
+        message: str,
+        session,
+        context_data: dict,
+        session_id: str,
+        model: str | None = None,
+        hooks: UsageTrackingHooks | None = None
+):
+    if getattr(agent, "guardrail_mode", None) == GuardrailMode.speculative:
+        return await run_with_speculative_guardrail(
+            agent,
+            message,
+            session,
+            context_data,
+            build_run_config(session_id, model),
+            hooks
+        )
+
+    if getattr(agent, "guardrail_mode", None) == GuardrailMode.single_call:
+        return await run_single_call(
+            agent,
+            message,
+            session,
+            context_data,
+            build_run_config(session_id, model),
+            hooks
+        )
+
+    return await Runner.run(
+        agent,
+        message,
+        session=session,
+        context=context_data,
+        run_config=build_run_config(session_id, model),
+        hooks=hooks
     )
 
 
+async def build_reply(result, context_data: dict):
+    """
+    Public reply for a finished run. The pre-sales agent only names its action
+    slugs (single-call answers also carry the guardrail decision), the buttons
+    are built here from the course data.
+    """
+    raw_output = result.final_output
+    if isinstance(raw_output, PreSalesSingleCallResponseSchema):
+        raw_output = raw_output.to_agent_output()
+    if isinstance(raw_output, PreSalesAgentOutputSchema):
+        return await enrich_response(raw_output, context_data)
+    return raw_output
+
+
+def get_called_tool_names(items) -> list[str]:
+    return [
+        item.raw_item.name
+        for item in items
+        if item.type == "tool_call_item" and hasattr(item.raw_item, "name")
+    ]
+
+
 def get_session(session_id=None):
     now = time.time()
 
@@ -84,9 +191,16 @@ def get_session(session_id=None):
     return session_id, SESSIONS[session_id]
 
 
-async def make_message_id(session_id: str,message: str)-> str:
-    normalized = message.lower().strip()
-    name = f"{session_id}:{normalized}"
+async def make_message_id(session_id: str, message: str, idempotency_key: str | None = None) -> str:
+    """
+    Replay key of a chat request. The widget sends an Idempotency-Key that it
+    reuses only when retrying, so a user repeating the same text ("yes") gets
+    a fresh turn. Clients without the header fall back to the message text.
+    """
+    if idempotency_key:
+        name = f"{session_id}:key:{idempotency_key}"
+    else:
+        name = f"{session_id}:{message.lower().strip()}"
 
     return str(uuid5(
         namespace=uuid.NAMESPACE_DNS,
@@ -116,6 +230,104 @@ async def make_message_id(session_id: str,message: str)-> str:
 #             }
 
 
+async def reply_from_fast_paths(
+        session,
+        message: str,
+        context_data: dict,
+        context_free: bool
+) -> tuple[dict | None, np.ndarray | None]:
+    """
+    Serve a course page question without the agent: single-field facts from the
+    page data first, then the semantic answer cache (context-free turns only,
+    the shared answers were written for them). A reply is written to the
+    session like a normal turn so follow-ups keep their context.
+    """
+    fact_reply = await resolve_fact_question(message, context_data)
+    if fact_reply is not None:
+        await session.add_items(build_answer_items(message, fact_reply))
+        return fact_reply, None
+
+    slug = get_cacheable_slug(context_data, message)
+    if not slug or not context_free:
+        return None, None
+
+    # The lookup runs before the guardrail, messages it would not route never pay for an embedding
+    if is_flagged_locally(message):
+        logger.info("Answer cache skipped, message flagged by the local pre-classifier")
+        return None, None
+
+    reply, query_embedding = await lookup_answer(slug, message)
+    if reply is not None:
+        await session.add_items(build_answer_items(message, reply))
+
+    return reply, query_embedding
+
+
+async def remember_answer(
+        message: str,
+        context_data: dict,
+        query_embedding: np.ndarray | None,
+        reply: dict,
+        tool_names: list[str],
+        context_free: bool
+):
+    if query_embedding is not None and is_cacheable_reply(reply, tool_names, context_free):
+        await store_answer(context_data["page_context"]["slug"], message, query_embedding, reply)
+
+
+async def reply_after_timeout(session, message: str, session_id: str) -> dict:
+    """Graceful reply for a turn that ran out of its deadline, stored like a normal turn"""
+    reply = build_timeout_reply()
+    await session.add_items(build_answer_items(message, reply))
+    logger.warning(f"Turn for {session_id} ran out of its deadline")
+
+    return {
+        "reply": reply,
+        "session_id": session_id
+    }
+
+
+async def resolve_trusted_action(context_data: dict, message: str, message_id: str) -> dict:
+    """
+    Flag messages sent by a widget button whose signed action token checks out.
+    Called after the replay check, a stored reply needs no token.
+    """
+    user_context = context_data.get("user_context") or {}
+    if not user_context.get("action"):
+        return context_data
+
+    course = user_context.get("course") or {}
+    context_data["trusted_action"] = await verify_action_token(
+        user_context.get("action_token"),
+        course.get("slug"),
+        message,
+        message_id
+    )
+
+    return context_data
+
+
+async def resolve_page_context(context_data: dict) -> dict:
+    page_context = context_data.get("page_context") or {}
+
+    if page_context:
+        page_context = context_data["page_context"]
+
+        url = page_context.get("url")
+
+        if url:
+            page_info = await extract_page_info_from_url(page_url=url)
+
+            if page_info.get("page_type") == "particular_course_page":
+                page_context["slug"] = page_info.get("slug")
+                page_context["page_type"] = page_info.get("page_type")
+
+        if page_context:
+            context_data["page_context"] = page_context
+
+    return context_data
+
+
 @router.post("/chat",
              deprecated=True)
 def chat(payload: dict):
@@ -165,7 +377,7 @@ def chat(payload: dict):
 
     raw_output = response.final_output
 
-    if isinstance(raw_output, PreSalesAgentResponseSchema):
+    if isinstance(raw_output, (PreSalesAgentResponseSchema, PreSalesAgentOutputSchema)):
         reply = raw_output.model_dump()
     elif isinstance(raw_output, dict):
         reply = raw_output
@@ -242,7 +454,7 @@ def chat_v2(payload: dict):
 
     raw_output = response.final_output
 
-    if isinstance(raw_output, PreSalesAgentResponseSchema):
+    if isinstance(raw_output, (PreSalesAgentResponseSchema, PreSalesAgentOutputSchema)):
         reply = raw_output.model_dump()
     elif isinstance(raw_output, dict):
         reply = raw_output
@@ -295,7 +507,7 @@ async def get_chat_history(session_id: str):
     try:
         async with SessionManager(session_id) as session:
             items = await session.get_items()
-            formatted_history = clean_chat(items)
+            formatted_history = await enrich_history(clean_chat(items))
         return {"history": formatted_history}
     except Exception as e:
         raise HTTPException(
@@ -304,14 +516,110 @@ async def get_chat_history(session_id: str):
         )
 
 
+async def handle_chat_turn(
+        session_id: str,
+        message: str,
+        context_data: dict,
+        guardrail_mode: GuardrailMode | None = None,
+        latency_slo_ms: int | None = None,
+        deadline: float | None = None,
+        idempotency_key: str | None = None
+) -> dict:
+    agent, response_schema = get_agent_config(context_data, guardrail_mode)
+    # Set after the agent is picked, an empty context selects the call agent
+    context_data["deadline"] = deadline or get_deadline()
+
+    async with SessionManager(session_id) as session:
+        try:
+            start_time = time.perf_counter()
+            start_page_prefetch(context_data)
+
+            context_free = await is_context_free_turn(session, context_data)
+            cached_reply, query_embedding = await reply_from_fast_paths(session, message, context_data, context_free)
+            if cached_reply is not None:
+                logger.info(f"Reply served without the agent for {session_id} in {time.perf_counter() - start_time}")
+                return {
+                    "reply": sign_reply_actions(cached_reply),
+                    "session_id": session_id
+                }
+
+            model_route = await route_model(message, session, context_data, latency_slo_ms)
+            run_start_time = time.perf_counter()
+            # Buffered so a run stopped by the deadline leaves no partial turn behind
+            run_session = BufferedSession(session)
+            usage = UsageTrackingHooks()
+            try:
+                response = await run_stage(
+                    "agent_run",
+                    run_agent(agent, message, run_session, context_data, session_id, model_route.model, usage),
+                    get_remaining(context_data)
+                )
+            except asyncio.TimeoutError:
+                await run_session.rollback(keep_input=False)
+                return await reply_after_timeout(session, message, session_id)
+            except InputGuardrailTripwireTriggered:
+                await run_session.commit()
+                raise
+            except asyncio.CancelledError:
+                # Client disconnected, the unanswered turn is dropped entirely
+                await run_session.rollback(keep_input=False)
+                record_abandoned_run(usage, run_start_time)
+                raise
+            except BaseException:
+                # A client sending an Idempotency-Key retries the failed turn under it, which writes the input again
+                await run_session.rollback(keep_input=idempotency_key is None)
+                raise
+            await run_session.commit()
+
+            tool_names = get_called_tool_names(response.new_items)
+            record_prefetch_usage(context_data, tool_names)
+            record_run_usage(agent.name, response.context_wrapper.usage, session_id)
+            record_tier_run(model_route, time.perf_counter() - run_start_time, response.context_wrapper.usage)
+
+            raw_output = await build_reply(response, context_data)
+            reply = raw_output.model_dump() if isinstance(raw_output, response_schema) else raw_output
+
+
+            reply['speech'] = clean_speech_output(reply['speech'])
+            logger.info(f"Reply Generated for {session_id} in {time.perf_counter() - start_time}")
+            await remember_answer(message, context_data, query_embedding, reply, tool_names, context_free)
+
+
+            return {
+                "reply": sign_reply_actions(reply),
+                "session_id": session_id
+            }
+
+        except InputGuardrailTripwireTriggered as e:
+            guardrail_result = e.guardrail_result
+
+
+            guardrail_output: GuardrailAgentResponse = (
+            guardrail_result.output.output_info
+            )
+
+            session_item = build_guardrail_message(guardrail_output)
+            await session.add_items(session_item)
+
+            return {
+                "reply": guardrail_output.model_dump(),
+                "session_id": session_id
+            }
+
+
 @router.post("/chat/v2/with_history")
-async def chat_v2_session(chat_payload: ChatPayload):
+async def chat_v2_session(
+        chat_payload: ChatPayload,
+        request: Request,
+        guardrail_mode: GuardrailMode | None = Header(default=None, alias="X-Guardrail-Mode"),
+        latency_slo_ms: int | None = Header(default=None, alias="X-Latency-SLO-Ms"),
+        deadline_ms: int | None = Header(default=None, alias="X-Request-Deadline-Ms"),
+        idempotency_key: str | None = Header(default=None, alias="Idempotency-Key")
+):
     session_id = chat_payload.session_id
     message = chat_payload.message
     context_data = chat_payload.context.model_dump() if chat_payload.context else {}
-
-    agent,response_schema = get_agent_config(context_data)
-
+    deadline = get_deadline(deadline_ms)
 
 
     if not session_id:
@@ -319,71 +627,305 @@ async def chat_v2_session(chat_payload: ChatPayload):
                             content={"details": "Session ID not provided"})
 
 
-    page_context = context_data.get("page_context") or {}
-
-    if page_context:
-        page_context = context_data["page_context"]
-
-        url = page_context.get("url")
+    context_data = await resolve_page_context(context_data)
 
-        if url:
-            page_info = await extract_page_info_from_url(page_url=url)
+    try:
+        message_id = await make_message_id(session_id, message, idempotency_key)
+
+        # Retries of a finished turn skip the queue entirely
+        stored = await get_stored_reply(message_id)
+        if stored is not None:
+            return stored
+
+        context_data = await resolve_trusted_action(context_data, message, message_id)
+
+        return await run_in_session_queue(
+            session_id,
+            message_id,
+            lambda: replay_or_run(
+                message_id,
+                lambda: handle_chat_turn(
+                    session_id, message, context_data, guardrail_mode, latency_slo_ms, deadline, idempotency_key
+                )
+            ),
+            is_disconnected=request.is_disconnected
+        )
 
-            if page_info.get("page_type") == "particular_course_page":
-                page_context["slug"] = page_info.get("slug")
-                page_context["page_type"] = page_info.get("page_type")
+    except SessionBusyError:
+        return JSONResponse(status_code=409,
+                            content={"details": "Session is busy"})
 
-        if page_context:
-            context_data["page_context"] = page_context
-
-    try:
-        async with SessionManager(session_id) as session:
-            async with redis_client.lock(
-                f"lock:session:{session_id}",
-                timeout=LOCK_TIMEOUT,  # auto-release safety
-                blocking_timeout=BLOCKING_TIMEOUT  # wait for other request
-            ):
-                try:
-                    start_time = time.perf_counter()
-                    response = await Runner.run(
-                        agent,
-                        message,
-                        session=session,
-                        context=context_data,
-                        run_config=build_run_config(session_id)
-                    )
+    except ClientDisconnectedError:
+        # Nobody is listening anymore, the status only shows up in access logs
+        return JSONResponse(status_code=499,
+                            content={"details": "Client disconnected"})
 
+    except Exception:
+        logger.exception(f"Agent Execution Failed")
+        raise HTTPException(status_code=500, detail="Internal Server Error")
+
+
+async def iter_stream_frames(result, start_time: float, session_id: str, context_data: dict | None = None):
+    """
+    With `context_data` (single-call mode) speech is held back until the
+    answer's guardrail decision has streamed, and dropped for the rest of the
+    response when the decision would trip the guardrail.
+    """
+    speech_extractor = SpeechStreamExtractor()
+    decision_extractor = SpeechStreamExtractor(GUARDRAIL_DECISION_KEY) if context_data is not None else None
+    decision = ""
+    held_speech = []
+    tool_names = {}
+    first_token_logged = False
+
+    async for event in result.stream_events():
+        if event.type == "raw_response_event":
+            if event.data.type == "response.created":
+                speech_extractor.reset()
+                if decision_extractor is not None:
+                    decision_extractor.reset()
+                    decision = ""
+                    held_speech.clear()
+
+            elif event.data.type == "response.output_text.delta":
+                speech_delta = speech_extractor.feed(event.data.delta)
+
+                if decision_extractor is not None:
+                    if not decision_extractor.done:
+                        decision += decision_extractor.feed(event.data.delta)
+                        if not decision_extractor.done:
+                            held_speech.append(speech_delta)
+                            continue
+                        speech_delta = "".join(held_speech) + speech_delta
+                        held_speech.clear()
+
+                    if not allows_streamed_speech(decision, context_data):
+                        continue
+
+                if not speech_delta:
+                    continue
+
+                if not first_token_logged:
+                    first_token_logged = True
+                    logger.info(f"First speech token for {session_id} in {time.perf_counter() - start_time}")
+
+                yield format_sse("speech_delta", {"delta": speech_delta})
+
+        elif event.type == "run_item_stream_event":
+            raw_item = event.item.raw_item
+
+            if event.name == "tool_called":
+                tool_names[raw_item.call_id] = raw_item.name
+                yield format_sse("tool_start", {
+                    "tool": raw_item.name,
+                    "call_id": raw_item.call_id,
+                })
 
-                    raw_output = response.final_output
-                    reply = raw_output.model_dump() if isinstance(raw_output, response_schema) else raw_output
+            elif event.name == "tool_output":
+                call_id = raw_item.get("call_id") if isinstance(raw_item, dict) else getattr(raw_item, "call_id", None)
+                yield format_sse("tool_end", {
+                    "tool": tool_names.get(call_id),
+                    "call_id": call_id,
+                })
 
 
-                    reply['speech'] = clean_speech_output(reply['speech'])
-                    logger.info(f"Reply Generated for {session_id} in {time.perf_counter() - start_time}")
+async def stream_chat_events(
+        session_id: str,
+        message: str,
+        context_data: dict,
+        guardrail_mode: GuardrailMode | None = None,
+        latency_slo_ms: int | None = None,
+        deadline: float | None = None,
+        idempotency_key: str | None = None
+):
+    agent, response_schema = get_agent_config(context_data, guardrail_mode)
+    context_data["deadline"] = deadline or get_deadline()
+    speculative = getattr(agent, "guardrail_mode", None) == GuardrailMode.speculative
+    single_call = getattr(agent, "guardrail_mode", None) == GuardrailMode.single_call
 
+    message_id = await make_message_id(session_id, message, idempotency_key)
 
-                    return {
-                        "reply": reply,
+    try:
+        async with session_turn(session_id), SessionManager(session_id) as session:
+            stored = await get_stored_reply(message_id)
+            if stored is not None:
+                yield format_sse("final", stored)
+                return
+
+            context_data = await resolve_trusted_action(context_data, message, message_id)
+
+            start_time = time.perf_counter()
+            # Every mode is buffered so a run stopped by the deadline leaves no partial turn behind
+            run_session = BufferedSession(session)
+            frames: asyncio.Queue = asyncio.Queue()
+            usage = UsageTrackingHooks()
+
+            try:
+                start_page_prefetch(context_data)
+
+                context_free = await is_context_free_turn(session, context_data)
+                cached_reply, query_embedding = await reply_from_fast_paths(session, message, context_data, context_free)
+                if cached_reply is not None:
+                    logger.info(f"Streamed reply served without the agent for {session_id}")
+                    final_response = {
+                        "reply": sign_reply_actions(cached_reply),
                         "session_id": session_id
                     }
+                    await store_reply(message_id, final_response)
+                    yield format_sse("final", final_response)
+                    return
+
+                model_route = await route_model(message, session, context_data, latency_slo_ms)
+                run_start_time = time.perf_counter()
+                result = Runner.run_streamed(
+                    agent,
+                    message,
+                    session=run_session,
+                    context=context_data,
+                    run_config=build_run_config(session_id, model_route.model),
+                    hooks=usage
+                )
+
+                async def pump_frames():
+                    try:
+                        async for frame in iter_stream_frames(
+                                result, start_time, session_id, context_data if single_call else None
+                        ):
+                            await frames.put(frame)
+                    finally:
+                        await frames.put(None)
+
+                pump_task = asyncio.create_task(pump_frames())
+
+                if speculative:
+                    # Frames are held in the queue until the guardrail verdict is known
+                    try:
+                        guardrail_output = await classify_session_input(message, session, context_data)
+                    except BaseException:
+                        result.cancel()
+                        await cancel_task(pump_task)
+                        raise
+
+                    if guardrail_output.is_guardrail_output_triggered:
+                        result.cancel()
+                        await cancel_task(pump_task)
+                        await run_session.rollback()
+                        record_cancelled_run(usage, start_time)
+                        raise build_guardrail_tripwire(guardrail_output)
 
-                except InputGuardrailTripwireTriggered as e:
-                    guardrail_result = e.guardrail_result
-
-
-                    guardrail_output: GuardrailAgentResponse = (
-                    guardrail_result.output.output_info
-                    )
+                try:
+                    while (frame := await asyncio.wait_for(frames.get(), get_remaining(context_data))) is not None:
+                        yield frame
+                    await pump_task
+                except asyncio.TimeoutError:
+                    result.cancel()
+                    await cancel_task(pump_task)
+                    await run_session.rollback(keep_input=False)
+                    record_stage("agent_run", time.perf_counter() - run_start_time, "timeout")
+                    final_response = await reply_after_timeout(session, message, session_id)
+                    await store_reply(message_id, final_response)
+                    yield format_sse("final", final_response)
+                    return
+                except asyncio.CancelledError:
+                    # Client disconnected mid-stream, stop the run and drop the unanswered turn
+                    result.cancel()
+                    await cancel_task(pump_task)
+                    await run_session.rollback(keep_input=False)
+                    record_abandoned_run(usage, run_start_time)
+                    raise
+                except BaseException:
+                    result.cancel()
+                    await cancel_task(pump_task)
+                    # Retried under the same Idempotency-Key, see handle_chat_turn
+                    await run_session.rollback(keep_input=idempotency_key is None)
+                    raise
+
+                record_stage("agent_run", time.perf_counter() - run_start_time, "ok")
+                if speculative:
+                    await run_session.commit()
+                    SPECULATIVE_RUNS.inc(outcome="committed")
+                elif single_call:
+                    # Speech was held back for a tripping decision, only the stored turn and final reply change here
+                    single_call_verdict = get_guardrail_output(result.final_output, context_data)
+                    if single_call_verdict is not None:
+                        await run_session.rollback()
+                        record_run_usage(agent.name, result.context_wrapper.usage, session_id)
+                        raise build_guardrail_tripwire(single_call_verdict)
+                    await run_session.commit()
+                else:
+                    await run_session.commit()
+
+                tool_names = get_called_tool_names(result.new_items)
+                record_prefetch_usage(context_data, tool_names)
+                record_run_usage(agent.name, result.context_wrapper.usage, session_id)
+                record_tier_run(model_route, time.perf_counter() - run_start_time, result.context_wrapper.usage)
+
+                raw_output = await build_reply(result, context_data)
+                reply = response_schema.model_validate(
+                    raw_output.model_dump() if isinstance(raw_output, response_schema) else raw_output
+                ).model_dump()
+
+                reply['speech'] = clean_speech_output(reply['speech'])
+                logger.info(f"Streamed reply generated for {session_id} in {time.perf_counter() - start_time}")
+                await remember_answer(message, context_data, query_embedding, reply, tool_names, context_free)
+
+                final_response = {
+                    "reply": sign_reply_actions(reply),
+                    "session_id": session_id
+                }
+                await store_reply(message_id, final_response)
+                yield format_sse("final", final_response)
+
+            except InputGuardrailTripwireTriggered as e:
+                guardrail_output: GuardrailAgentResponse = (
+                    e.guardrail_result.output.output_info
+                )
+
+                session_item = build_guardrail_message(guardrail_output)
+                await session.add_items(session_item)
+
+                final_response = {
+                    "reply": guardrail_output.model_dump(mode="json"),
+                    "session_id": session_id
+                }
+                await store_reply(message_id, final_response)
+                yield format_sse("final", final_response)
+
+    except SessionBusyError:
+        yield format_sse("error", {"details": "Session is busy"})
 
-                    session_item = build_guardrail_message(guardrail_output)
-                    await session.add_items(session_item)
+    except Exception:
+        logger.exception(f"Streamed Agent Execution Failed")
+        yield format_sse("error", {"details": "Internal Server Error"})
+
+
+@router.post("/chat/v2/with_history/stream",
+             description="Server-sent events variant of /chat/v2/with_history")
+async def chat_v2_session_stream(
+        chat_payload: ChatPayload,
+        guardrail_mode: GuardrailMode | None = Header(default=None, alias="X-Guardrail-Mode"),
+        latency_slo_ms: int | None = Header(default=None, alias="X-Latency-SLO-Ms"),
+        deadline_ms: int | None = Header(default=None, alias="X-Request-Deadline-Ms"),
+        idempotency_key: str | None = Header(default=None, alias="Idempotency-Key")
+):
+    session_id = chat_payload.session_id
+    message = chat_payload.message
+    context_data = chat_payload.context.model_dump() if chat_payload.context else {}
+    deadline = get_deadline(deadline_ms)
 
-                    return {
-                        "reply": guardrail_output.model_dump(),
-                        "session_id": session_id
-                    }
+    if not session_id:
+        return JSONResponse(status_code=404,
+                            content={"details": "Session ID not provided"})
 
+    context_data = await resolve_page_context(context_data)
 
-    except Exception:
-        logger.exception(f"Agent Execution Failed")
-        raise HTTPException(status_code=500, detail="Internal Server Error")
\ No newline at end of file
+    return StreamingResponse(
+        stream_chat_events(
+            session_id, message, context_data, guardrail_mode, latency_slo_ms, deadline, idempotency_key
+        ),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            "X-Accel-Buffering": "no",
+        }
+    )
@@ -1,14 +1,15 @@
-import time
 from fastapi import APIRouter, HTTPException
 from fastapi.responses import JSONResponse
 import uuid
 from services.mongo_db import get_sync_details, update_sync_details, fetch_changes, increment_interest_count
+from services.answer_cache import invalidate_answers
+from services.page_data_handler import PAGE_CACHE, build_page_entry
 from services.ingestion import ingest_course_embedding
+from services.vector_index import load_vector_index
 from services.weaviate_service import delete_weaviate_object
 from services.data_handler import clean_data_v2
-import json
 from starlette.responses import JSONResponse
-from services.redis_service import redis_client
+from services import metrics
 from logging import Logger
 
 
@@ -30,19 +31,8 @@ async def prewarn_page_cache(payload: dict):
     data = payload["data"]
     source = str(payload.get("source","api_call"))
 
-    key = f"page:course:{slug}"
-
     logger.info("Storing Page in Cache...")
-    await redis_client.set(
-                key,
-                json.dumps({
-                    "slug": slug,
-                    "data":data,
-                    "source":source,
-                    "updated_at": int(time.time()),
-                }),
-            ex=3600
-        )
+    await PAGE_CACHE.set(slug, build_page_entry(slug, data, source), broadcast=True)
 
     logger.info("Cache stored")
 
@@ -51,6 +41,12 @@ async def prewarn_page_cache(payload: dict):
                                  "OK"})
 
 
+@router.get("/metrics",
+            description="Snapshot of in-process counters and histograms")
+async def get_metrics():
+    return metrics.snapshot()
+
+
 @router.post("/sync_mongo_data",
              description="Synchronize Weaviate Collection with Mongo DB Collection")
 async def sync_mongo_data():
@@ -74,8 +70,11 @@ async def sync_mongo_data():
         updated_data = [doc for doc in changes if not doc["isDeleted"]]
 
         await delete_weaviate_object(slugs_to_purge)
+        await invalidate_answers(slugs_to_purge)
+        await PAGE_CACHE.invalidate(*slugs_to_purge)
 
         if not updated_data:
+            await load_vector_index()
             return JSONResponse(
                 status_code=200,
                 content = {
@@ -89,6 +88,7 @@ async def sync_mongo_data():
         cleaned_data = clean_data_v2(updated_data)
 
         ingestion_complete = await ingest_course_embedding(cleaned_data)
+        await load_vector_index()
 
         if ingestion_complete:
             await update_sync_details()
@@ -0,0 +1,132 @@
+import base64
+import hashlib
+import hmac
+import json
+import logging
+import os
+import secrets
+import time
+
+from dotenv import load_dotenv
+
+from services import metrics
+from services.redis_service import redis_client
+
+
+load_dotenv()
+
+
+logger = logging.getLogger("Action Token")
+
+
+# Without a secret no tokens are issued and every message goes through the guardrail
+ACTION_TOKEN_SECRET = os.getenv("ACTION_TOKEN_SECRET", "")
+ACTION_TOKEN_TTL = int(os.getenv("ACTION_TOKEN_TTL", str(24 * 3600)))
+# The only widget button that sends a chat message
+TRUSTED_ACTION_TYPE = "interest"
+
+
+ACTION_TOKEN_RESULTS = metrics.counter(
+    "action_token_total",
+    "Signed widget action tokens issued and verified, by outcome"
+)
+
+
+def _b64encode(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode()
+
+
+def _b64decode(data: str) -> bytes:
+    return base64.urlsafe_b64decode(data + "=" * (-len(data) % 4))
+
+
+def _sign(payload: str) -> str:
+    return _b64encode(hmac.new(ACTION_TOKEN_SECRET.encode(), payload.encode(), hashlib.sha256).digest())
+
+
+def build_interest_message(title: str) -> str:
+    """Text the widget sends for an interest button, see handleAction in chat-widget.js"""
+    return f'I am interested in "{title}"'
+
+
+def issue_action_token(action_type: str, slug: str, title: str) -> str | None:
+    if not ACTION_TOKEN_SECRET:
+        return None
+
+    payload = _b64encode(json.dumps({
+        "type": action_type,
+        "slug": slug,
+        "title": title,
+        "nonce": secrets.token_urlsafe(8),
+        "exp": int(time.time()) + ACTION_TOKEN_TTL,
+    }, separators=(",", ":")).encode())
+
+    ACTION_TOKEN_RESULTS.inc(outcome="issued")
+    return f"{payload}.{_sign(payload)}"
+
+
+def sign_reply_actions(reply: dict) -> dict:
+    """Copy of a reply with an action token next to each of its interest actions"""
+    actions = reply.get("actions")
+    if not actions or not ACTION_TOKEN_SECRET:
+        return reply
+
+    return {
+        **reply,
+        "actions": [
+            {
+                **action,
+                "token": issue_action_token(action["type"], action["course"]["slug"], action["course"]["title"])
+            } if action["type"] == TRUSTED_ACTION_TYPE else action
+            for action in actions
+        ],
+    }
+
+
+async def verify_action_token(token: str | None, slug: str | None, message: str, message_id: str) -> bool:
+    """
+    True for a valid, unexpired interest token issued for this course, sent with
+    the widget's fixed interest message. Anything else typed alongside a token
+    goes through the guardrail.
+
+    Tokens are single use. The nonce is bound to the first `message_id` that
+    spent it, so a retry of that same request keeps its trusted status.
+    """
+    if not token or not ACTION_TOKEN_SECRET:
+        return False
+
+    try:
+        payload, signature = token.split(".", 1)
+        if not hmac.compare_digest(signature, _sign(payload)):
+            ACTION_TOKEN_RESULTS.inc(outcome="bad_signature")
+            return False
+        claims = json.loads(_b64decode(payload))
+    except (ValueError, json.JSONDecodeError):
+        ACTION_TOKEN_RESULTS.inc(outcome="malformed")
+        return False
+
+    ttl = claims["exp"] - int(time.time())
+    if (
+        ttl <= 0
+        or claims.get("type") != TRUSTED_ACTION_TYPE
+        or claims.get("slug") != slug
+        or "title" not in claims
+        or message.strip() != build_interest_message(claims["title"])
+    ):
+        ACTION_TOKEN_RESULTS.inc(outcome="rejected")
+        return False
+
+    nonce_key = f"action_token:{claims['nonce']}"
+    try:
+        first_use = await redis_client.set(nonce_key, message_id, nx=True, ex=ttl)
+        spent_by = None if first_use else await redis_client.get(nonce_key)
+    except Exception:
+        logger.exception("Action token replay check failed")
+        return False
+
+    if not first_use and spent_by != message_id:
+        ACTION_TOKEN_RESULTS.inc(outcome="reused")
+        return False
+
+    ACTION_TOKEN_RESULTS.inc(outcome="accepted")
+    return True
@@ -0,0 +1,202 @@
+import hashlib
+import json
+import logging
+import os
+
+import numpy as np
+from dotenv import load_dotenv
+
+from services import metrics
+from services.data_handler import normalize_query
+from services.redis_service import redis_binary_client, redis_client
+from services.similarity import EMBEDDING_DTYPE, get_query_embedding, pack_embedding
+
+
+load_dotenv()
+
+
+logger = logging.getLogger("Answer Cache")
+
+
+ANSWER_CACHE_ENABLED = os.getenv("ANSWER_CACHE", 'True') == 'True'
+ANSWER_CACHE_THRESHOLD = float(os.getenv("ANSWER_CACHE_THRESHOLD", "0.93"))
+ANSWER_CACHE_TTL = int(os.getenv("ANSWER_CACHE_TTL", str(24 * 3600)))
+# Questions stored per course page, lookups compare against all of them
+ANSWER_CACHE_MAX_ENTRIES = int(os.getenv("ANSWER_CACHE_MAX_ENTRIES", "100"))
+# Fact questions are short, long messages usually carry conversation specific detail
+ANSWER_CACHE_MAX_WORDS = 12
+# Only page fact answers are shared between visitors, lead capture and chit-chat never are
+CACHEABLE_INTENTS = {"course_inquiry"}
+CACHEABLE_TOOLS = {"get_current_page_data_using_slug"}
+
+
+ANSWER_CACHE_RESULTS = metrics.counter(
+    "answer_cache_total",
+    "Semantic answer cache lookups and writes by outcome"
+)
+
+
+def answer_key(slug: str) -> str:
+    return f"answer:course:{slug}"
+
+
+def answer_vectors_key(slug: str) -> str:
+    """Packed float32 question embeddings, same fields as `answer_key`"""
+    return f"answer:course:{slug}:vectors"
+
+
+def best_match(embedding: np.ndarray, vectors: dict[bytes, bytes]) -> tuple[bytes | None, float]:
+    """Field of the stored question closest to `embedding` and its cosine score, one matmul over all of them"""
+    # Entries written with another EMBEDDING_DIMENSIONS cannot be compared
+    entries = [(field, packed) for field, packed in vectors.items() if len(packed) == embedding.nbytes]
+    if not entries:
+        return None, 0.0
+
+    matrix = np.frombuffer(b"".join(packed for _, packed in entries), dtype=EMBEDDING_DTYPE)
+    matrix = matrix.reshape(len(entries), -1)
+    norms = np.linalg.norm(matrix, axis=1) * np.linalg.norm(embedding)
+    scores = (matrix @ embedding) / np.where(norms == 0, 1, norms)
+
+    best = int(np.argmax(scores))
+    return entries[best][0], float(scores[best])
+
+
+def get_cacheable_slug(context_data: dict, message: str) -> str | None:
+    """Course slug to cache answers under, `None` when this turn must not share answers"""
+    if not ANSWER_CACHE_ENABLED:
+        return None
+
+    page_context = context_data.get("page_context") or {}
+    user_context = context_data.get("user_context") or {}
+
+    if page_context.get("page_type") != "particular_course_page" or not page_context.get("slug"):
+        return None
+
+    # Widget actions (e.g. "interested" buttons) start lead capture, never a shared answer
+    if user_context.get("action"):
+        return None
+
+    normalized = normalize_query(message)
+    if not normalized or len(normalized.split("_")) > ANSWER_CACHE_MAX_WORDS:
+        return None
+
+    return page_context["slug"]
+
+
+async def is_context_free_turn(session, context_data: dict) -> bool:
+    """
+    Whether the reply can only depend on the page and the message: the session's
+    first user turn, with nothing in user_context. Only such turns share answers,
+    follow-ups and anything after lead details were given depend on the conversation.
+    """
+    if not ANSWER_CACHE_ENABLED:
+        return False
+
+    page_context = context_data.get("page_context") or {}
+    if page_context.get("page_type") != "particular_course_page":
+        return False
+
+    if any((context_data.get("user_context") or {}).values()):
+        return False
+
+    try:
+        return not await session.get_items(limit=1)
+    except Exception:
+        logger.exception("Answer cache history check failed")
+        return False
+
+
+async def lookup_answer(slug: str, message: str) -> tuple[dict | None, np.ndarray | None]:
+    """
+    Cached reply for the closest stored question on this page, if it is within
+    ANSWER_CACHE_THRESHOLD. The query embedding is returned for `store_answer`.
+    """
+    try:
+        embedding = await get_query_embedding(message)
+        best_field, best_score = best_match(embedding, await redis_binary_client.hgetall(answer_vectors_key(slug)))
+
+        raw_entry = None
+        if best_field is not None and best_score >= ANSWER_CACHE_THRESHOLD:
+            raw_entry = await redis_client.hget(answer_key(slug), best_field.decode())
+    except Exception:
+        logger.exception("Answer cache read failed")
+        ANSWER_CACHE_RESULTS.inc(outcome="error")
+        return None, None
+
+    if not raw_entry:
+        ANSWER_CACHE_RESULTS.inc(outcome="miss")
+        return None, embedding
+
+    best_entry = json.loads(raw_entry)
+
+    ANSWER_CACHE_RESULTS.inc(outcome="hit")
+    logger.info(f"Answer cache hit on {slug} ({best_score:.3f}): {message!r} ~ {best_entry['query']!r}")
+    return best_entry["reply"], embedding
+
+
+def is_cacheable_reply(reply: dict, tool_names: list[str], context_free: bool) -> bool:
+    """
+    An empty tool set passes the tool check (the page data is often prefetched),
+    so `context_free` is what keeps conversation specific replies out.
+    """
+    return (
+        context_free
+        and reply.get("intent") in CACHEABLE_INTENTS
+        and set(tool_names) <= CACHEABLE_TOOLS
+    )
+
+
+async def store_answer(slug: str, message: str, embedding: np.ndarray, reply: dict):
+    key = answer_key(slug)
+    vectors_key = answer_vectors_key(slug)
+    field = hashlib.sha1(normalize_query(message).encode()).hexdigest()
+
+    try:
+        if await redis_binary_client.hlen(vectors_key) >= ANSWER_CACHE_MAX_ENTRIES:
+            ANSWER_CACHE_RESULTS.inc(outcome="full")
+            return
+
+        # The reply goes in first, a lookup only reads replies whose vector it found
+        await redis_client.hset(key, field, json.dumps({
+            "query": message,
+            "reply": reply,
+        }))
+        await redis_binary_client.hset(vectors_key, field, pack_embedding(embedding))
+        # The TTL is set once per page so a busy page still refreshes daily
+        await redis_client.expire(key, ANSWER_CACHE_TTL, nx=True)
+        await redis_binary_client.expire(vectors_key, ANSWER_CACHE_TTL, nx=True)
+        ANSWER_CACHE_RESULTS.inc(outcome="stored")
+    except Exception:
+        logger.exception("Answer cache write failed")
+
+
+async def invalidate_answers(slugs: list[str]):
+    if not slugs:
+        return
+
+    deleted = await redis_client.delete(*(answer_key(slug) for slug in slugs))
+    await redis_client.delete(*(answer_vectors_key(slug) for slug in slugs))
+    logger.info(f"Invalidated cached answers for {deleted} of {len(slugs)} synced courses")
+
+
+def build_answer_items(message: str, reply: dict) -> list[dict]:
+    """User message and assistant reply in the shape the runner stores for a normal turn"""
+    return [
+        {
+            "content": message,
+            "role": "user",
+        },
+        {
+            "content": [
+                {
+                    "type": "output_text",
+                    "text": json.dumps(reply),
+                    "annotations": [],
+                    "logprobs": [],
+                }
+            ],
+            "role": "assistant",
+            "type": "message",
+            "status": "completed",
+        },
+    ]
@@ -1,6 +1,8 @@
 import regex as re
+from functools import lru_cache
 from typing import Any
 import json
+import tiktoken
 from bs4 import BeautifulSoup
 
 
@@ -177,4 +179,28 @@ def clean_speech_output(speech: str) -> str:
     speech = re.sub(r'\n{3,}', '\n\n', speech)
     speech = speech.strip()
 
-    return speech
\ No newline at end of file
+    return speech
+
+@lru_cache(maxsize=4)
+def get_encoding(model: str = "gpt-4o-mini"):
+    try:
+        return tiktoken.encoding_for_model(model)
+    except KeyError:
+        return tiktoken.get_encoding("o200k_base")
+
+
+def count_text_tokens(text: str, model: str = "gpt-4o-mini") -> int:
+    if not text:
+        return 0
+    return len(get_encoding(model).encode(text))
+
+
+def count_item_tokens(item: Any, model: str = "gpt-4o-mini") -> int:
+    """Approximate prompt tokens for a session item: every string value plus a small per-item overhead"""
+    if isinstance(item, str):
+        return count_text_tokens(item, model)
+    if isinstance(item, dict):
+        return 4 + sum(count_item_tokens(value, model) for value in item.values())
+    if isinstance(item, list):
+        return sum(count_item_tokens(value, model) for value in item)
+    return 0
@@ -0,0 +1,105 @@
+import asyncio
+import logging
+import os
+import time
+from typing import Awaitable, TypeVar
+
+from dotenv import load_dotenv
+
+from services import metrics
+
+
+load_dotenv()
+
+
+logger = logging.getLogger("Request Deadline")
+
+
+# End-to-end budget of a chat turn, an X-Request-Deadline-Ms header can only shorten it
+REQUEST_DEADLINE_SECONDS = float(os.getenv("REQUEST_DEADLINE_SECONDS", "20"))
+# Time kept back for the model to write its answer after the last tool returns
+DEADLINE_REPLY_RESERVE_SECONDS = float(os.getenv("DEADLINE_REPLY_RESERVE_SECONDS", "4"))
+# Tools are skipped outright when less than this is left for them
+DEADLINE_MIN_TOOL_SECONDS = 0.5
+
+TIMEOUT_SPEECH = "Sorry, this is taking longer than expected. Could you please ask me again in a moment?"
+
+
+STAGE_SECONDS = metrics.histogram(
+    "request_stage_seconds",
+    "Time spent per stage of a chat turn under its deadline, by stage and outcome"
+)
+
+
+T = TypeVar("T")
+
+
+def get_deadline(deadline_ms: int | None = None) -> float:
+    """Monotonic deadline of a turn starting now, kept under `deadline` in the run context for tools"""
+    seconds = REQUEST_DEADLINE_SECONDS
+    if deadline_ms is not None and deadline_ms > 0:
+        seconds = min(seconds, deadline_ms / 1000)
+
+    return time.monotonic() + seconds
+
+
+def get_remaining(context_data: dict | None) -> float | None:
+    """Seconds left before the turn's deadline, `None` when the turn has none"""
+    deadline = (context_data or {}).get("deadline")
+    if deadline is None:
+        return None
+    return max(0.0, deadline - time.monotonic())
+
+
+def get_tool_budget(context_data: dict | None) -> float | None:
+    remaining = get_remaining(context_data)
+    if remaining is None:
+        return None
+    return remaining - DEADLINE_REPLY_RESERVE_SECONDS
+
+
+async def run_stage(
+        stage: str,
+        awaitable: Awaitable[T],
+        budget: float | None,
+        shield: bool = False
+) -> T:
+    """
+    Await `awaitable` within `budget` seconds and record how the stage ended.
+    Raises `asyncio.TimeoutError` when the budget is too short or runs out.
+    A shielded awaitable (e.g. a write) is always started and keeps running
+    in the background after a timeout.
+    """
+    if budget is not None and budget < DEADLINE_MIN_TOOL_SECONDS and not shield:
+        if asyncio.iscoroutine(awaitable):
+            awaitable.close()
+        record_stage(stage, 0, "skipped")
+        raise asyncio.TimeoutError(f"No budget left for {stage}")
+
+    start_time = time.perf_counter()
+    try:
+        result = await asyncio.wait_for(
+            asyncio.shield(awaitable) if shield else awaitable,
+            None if budget is None else max(budget, 0)
+        )
+    except asyncio.TimeoutError:
+        record_stage(stage, time.perf_counter() - start_time, "timeout")
+        raise
+
+    record_stage(stage, time.perf_counter() - start_time, "ok")
+    return result
+
+
+def record_stage(stage: str, seconds: float, outcome: str):
+    STAGE_SECONDS.observe(seconds, stage=stage, outcome=outcome)
+    if outcome != "ok":
+        logger.warning(f"{stage} {outcome} after {seconds:.2f}s")
+
+
+def build_timeout_reply() -> dict:
+    return {
+        "speech": TIMEOUT_SPEECH,
+        "intent": "timeout",
+        "confidence": "low",
+        "actions": [],
+    }
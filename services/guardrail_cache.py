@@ -0,0 +1,77 @@
+import hashlib
+import logging
+import os
+
+from dotenv import load_dotenv
+from pydantic import ValidationError
+
+from model.output_schema import GuardrailAgentResponse
+from services import metrics
+from services.data_handler import normalize_query
+from services.redis_service import redis_client
+
+
+load_dotenv()
+
+
+logger = logging.getLogger("Guardrail Cache")
+
+
+GUARDRAIL_CACHE_ENABLED = os.getenv("GUARDRAIL_CACHE", 'True') == 'True'
+GUARDRAIL_CACHE_TTL = int(os.getenv("GUARDRAIL_CACHE_TTL", str(24 * 3600)))
+# Long messages practically never repeat, caching them only fills Redis
+GUARDRAIL_CACHE_MAX_WORDS = 8
+
+
+GUARDRAIL_CACHE_RESULTS = metrics.counter(
+    "guardrail_cache_total",
+    "Guardrail verdict cache lookups by outcome"
+)
+
+
+def build_cache_key(version: str, user_input: str, state_fingerprint: str) -> str | None:
+    if not GUARDRAIL_CACHE_ENABLED:
+        return None
+
+    normalized = normalize_query(user_input)
+    if not normalized or len(normalized.split("_")) > GUARDRAIL_CACHE_MAX_WORDS:
+        return None
+
+    digest = hashlib.sha1(normalized.encode()).hexdigest()
+    return f"guardrail:{version}:{state_fingerprint}:{digest}"
+
+
+async def get_cached_verdict(key: str | None) -> GuardrailAgentResponse | None:
+    if key is None:
+        GUARDRAIL_CACHE_RESULTS.inc(outcome="skip")
+        return None
+
+    try:
+        cached = await redis_client.get(key)
+    except Exception:
+        logger.exception("Guardrail cache read failed")
+        GUARDRAIL_CACHE_RESULTS.inc(outcome="error")
+        return None
+
+    if not cached:
+        GUARDRAIL_CACHE_RESULTS.inc(outcome="miss")
+        return None
+
+    try:
+        verdict = GuardrailAgentResponse.model_validate_json(cached)
+    except ValidationError:
+        GUARDRAIL_CACHE_RESULTS.inc(outcome="miss")
+        return None
+
+    GUARDRAIL_CACHE_RESULTS.inc(outcome="hit")
+    return verdict
+
+
+async def set_cached_verdict(key: str | None, verdict: GuardrailAgentResponse):
+    if key is None:
+        return
+
+    try:
+        await redis_client.set(key, verdict.model_dump_json(), ex=GUARDRAIL_CACHE_TTL)
+    except Exception:
+        logger.exception("Guardrail cache write failed")
@@ -0,0 +1,75 @@
+import json
+import logging
+import os
+from typing import Any, Awaitable, Callable
+
+from dotenv import load_dotenv
+
+from services import metrics
+from services.redis_service import redis_client
+
+
+load_dotenv()
+
+
+logger = logging.getLogger("Idempotency")
+
+
+# Retries land within seconds. Requests without an Idempotency-Key are keyed on their
+# text, the short window keeps a user genuinely repeating a message ("yes") from
+# getting the old reply later in the conversation.
+IDEMPOTENCY_WINDOW = int(os.getenv("IDEMPOTENCY_WINDOW", "30"))
+
+
+REPLAY_RESULTS = metrics.counter(
+    "idempotent_replay_total",
+    "Chat requests answered from the replay cache versus freshly stored"
+)
+
+
+def reply_key(message_id: str) -> str:
+    return f"reply:{message_id}"
+
+
+async def get_stored_reply(message_id: str) -> dict | None:
+    try:
+        cached = await redis_client.get(reply_key(message_id))
+    except Exception:
+        logger.exception("Replay cache read failed")
+        return None
+
+    if not cached:
+        return None
+
+    REPLAY_RESULTS.inc(outcome="replayed")
+    logger.info(f"Replaying stored reply for message {message_id}")
+    return json.loads(cached)
+
+
+async def store_reply(message_id: str, response: dict):
+    try:
+        await redis_client.set(
+            reply_key(message_id),
+            json.dumps(response, default=str),
+            ex=IDEMPOTENCY_WINDOW
+        )
+        REPLAY_RESULTS.inc(outcome="stored")
+    except Exception:
+        logger.exception("Replay cache write failed")
+
+
+async def replay_or_run(message_id: str, handler: Callable[[], Awaitable[dict]]) -> Any:
+    """
+    Return the stored reply for a retried message, otherwise run the turn and store it.
+
+    Callers run this while holding the session turn, so a retry that reached
+    another worker waits for the original run and then finds its reply here.
+    """
+    stored = await get_stored_reply(message_id)
+    if stored is not None:
+        return stored
+
+    response = await handler()
+    await store_reply(message_id, response)
+
+    return response
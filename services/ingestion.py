@@ -1,9 +1,8 @@
-from openai import OpenAI
-import os
 import tiktoken
 from uuid import UUID
 from dotenv import load_dotenv
 import logging
+from services.similarity import embed_texts
 from services.weaviate_service import upsert_course_embedding
 
 
@@ -12,11 +11,6 @@ load_dotenv()
 
 logger = logging.getLogger("Ingestion Service")
 
-client = OpenAI(
-    api_key=os.getenv("OPENAI_API_KEY"),
-)
-
-
 async def build_chunks(payload: dict)-> str:
     return " ".join([
         payload["course_title"],
@@ -51,14 +45,11 @@ async def ingest_course_embedding(payload: list[dict]):
         # full_text = " ".join(data.values())
         # chunks = chunk_text(full_text)
 
-        response = client.embeddings.create(
-            model="text-embedding-3-small",
-            input=chunks
-        ).data[0]
+        embedding = (await embed_texts([chunks]))[0]
 
         weaviate_data = {
             "slug": data["slug"],
-            "embedding": response.embedding,
+            "embedding": embedding,
             "metadata": data,
             "embedding_text": chunks
         }
@@ -0,0 +1,154 @@
+import logging
+import threading
+
+
+logger = logging.getLogger("Metrics")
+
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+_registry: dict = {}
+_registry_lock = threading.Lock()
+
+
+def _label_key(labels: dict) -> str:
+    return ",".join(f"{k}={labels[k]}" for k in sorted(labels))
+
+
+class Counter:
+    """Monotonic in-process counter with optional labels"""
+
+    def __init__(self, name: str, description: str = ""):
+        self.name = name
+        self.description = description
+        self._values: dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(_label_key(labels), 0)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "type": "counter",
+                "description": self.description,
+                "values": dict(self._values),
+            }
+
+
+class Gauge:
+    """Point-in-time value that can go up and down"""
+
+    def __init__(self, name: str, description: str = ""):
+        self.name = name
+        self.description = description
+        self._values: dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def set(self, value: float, **labels):
+        with self._lock:
+            self._values[_label_key(labels)] = value
+
+    def inc(self, amount: float = 1, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, **labels):
+        self.inc(-amount, **labels)
+
+    def value(self, **labels) -> float:
+        return self._values.get(_label_key(labels), 0)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "type": "gauge",
+                "description": self.description,
+                "values": dict(self._values),
+            }
+
+
+class Histogram:
+    """Cumulative bucket histogram with optional labels"""
+
+    def __init__(self, name: str, description: str = "", buckets: tuple = DEFAULT_BUCKETS):
+        self.name = name
+        self.description = description
+        self.buckets = tuple(sorted(buckets))
+        self._values: dict[str, dict] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            series = self._values.get(key)
+            if series is None:
+                series = {
+                    "count": 0,
+                    "sum": 0.0,
+                    "buckets": [0] * len(self.buckets),
+                }
+                self._values[key] = series
+
+            series["count"] += 1
+            series["sum"] += value
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series["buckets"][index] += 1
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "type": "histogram",
+                "description": self.description,
+                "values": {
+                    key: {
+                        "count": series["count"],
+                        "sum": series["sum"],
+                        "buckets": {
+                            str(bound): count
+                            for bound, count in zip(self.buckets, series["buckets"])
+                        },
+                    }
+                    for key, series in self._values.items()
+                },
+            }
+
+
+def counter(name: str, description: str = "") -> Counter:
+    with _registry_lock:
+        metric = _registry.get(name)
+        if metric is None:
+            metric = Counter(name, description)
+            _registry[name] = metric
+        return metric
+
+
+def gauge(name: str, description: str = "") -> Gauge:
+    with _registry_lock:
+        metric = _registry.get(name)
+        if metric is None:
+            metric = Gauge(name, description)
+            _registry[name] = metric
+        return metric
+
+
+def histogram(name: str, description: str = "", buckets: tuple = DEFAULT_BUCKETS) -> Histogram:
+    with _registry_lock:
+        metric = _registry.get(name)
+        if metric is None:
+            metric = Histogram(name, description, buckets)
+            _registry[name] = metric
+        return metric
+
+
+def snapshot() -> dict:
+    with _registry_lock:
+        metrics = list(_registry.values())
+    return {metric.name: metric.snapshot() for metric in metrics}
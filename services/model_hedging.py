@@ -0,0 +1,170 @@
+import asyncio
+import logging
+import os
+import statistics
+import time
+from collections import deque
+from typing import AsyncIterator
+
+from agents import ModelResponse
+from agents.models.interface import Model, ModelProvider
+from agents.models.multi_provider import MultiProvider
+from dotenv import load_dotenv
+
+from config import MODEL
+from services import metrics
+
+
+load_dotenv()
+
+
+logger = logging.getLogger("Model Hedging")
+
+
+# Off by default, every hedge is a second paid model request
+MODEL_HEDGING = os.getenv("MODEL_HEDGING", 'False') == 'True'
+# A duplicate request is sent once the first has been slower than this latency percentile
+MODEL_HEDGE_PERCENTILE = float(os.getenv("MODEL_HEDGE_PERCENTILE", "0.95"))
+# Delay used until enough latencies have been observed for the model
+MODEL_HEDGE_DEFAULT_DELAY = float(os.getenv("MODEL_HEDGE_DEFAULT_DELAY", "4"))
+# Hedges allowed per primary request, caps the extra spend (0.05 = at most 5% more requests)
+MODEL_HEDGE_MAX_RATIO = float(os.getenv("MODEL_HEDGE_MAX_RATIO", "0.05"))
+# Tier from config.MODEL the hedge is sent to, empty hedges on the same model
+MODEL_HEDGE_FALLBACK_TIER = os.getenv("MODEL_HEDGE_FALLBACK_TIER", "")
+
+LATENCY_WINDOW = 200
+MIN_LATENCY_SAMPLES = 20
+MIN_HEDGE_DELAY = 0.5
+# Cap on saved-up hedge credit, so a quiet period cannot fund a burst of hedges
+MAX_HEDGE_CREDIT = 10
+
+
+MODEL_HEDGES = metrics.counter(
+    "model_hedges_total",
+    "Duplicate model requests for slow responses, by model and outcome (fired, won, lost, over_budget)"
+)
+
+
+class HedgeBudget:
+    """Token bucket that earns `ratio` of a hedge per primary request"""
+
+    def __init__(self, ratio: float, max_credit: float = MAX_HEDGE_CREDIT):
+        self.ratio = ratio
+        self.max_credit = max_credit
+        self.credit = 0.0
+
+    def record_request(self):
+        self.credit = min(self.max_credit, self.credit + self.ratio)
+
+    def try_spend(self) -> bool:
+        if self.credit < 1:
+            return False
+        self.credit -= 1
+        return True
+
+
+class LatencyTracker:
+    def __init__(self, window: int = LATENCY_WINDOW):
+        self._samples: dict[str, deque] = {}
+        self.window = window
+
+    def observe(self, model_name: str, seconds: float):
+        self._samples.setdefault(model_name, deque(maxlen=self.window)).append(seconds)
+
+    def hedge_delay(self, model_name: str) -> float:
+        samples = self._samples.get(model_name)
+        if not samples or len(samples) < MIN_LATENCY_SAMPLES:
+            return MODEL_HEDGE_DEFAULT_DELAY
+
+        cut_points = statistics.quantiles(samples, n=100)
+        index = min(98, max(0, int(MODEL_HEDGE_PERCENTILE * 100) - 1))
+        return max(MIN_HEDGE_DELAY, cut_points[index])
+
+
+_budget = HedgeBudget(MODEL_HEDGE_MAX_RATIO)
+_latencies = LatencyTracker()
+
+
+async def _timed(model_name: str, request) -> ModelResponse:
+    start_time = time.perf_counter()
+    response = await request
+    _latencies.observe(model_name, time.perf_counter() - start_time)
+    return response
+
+
+class HedgedModel(Model):
+    """
+    Sends a duplicate request (optionally to the fallback tier) when the first
+    response is slower than the model's usual latency percentile. The first
+    response wins and the other request is cancelled.
+    Streamed responses are not hedged, their first tokens are already on the way.
+    """
+
+    def __init__(self, model_name: str, primary: Model, hedge: Model, hedge_name: str):
+        self.model_name = model_name
+        self.primary = primary
+        self.hedge = hedge
+        self.hedge_name = hedge_name
+
+    async def get_response(self, *args, **kwargs) -> ModelResponse:
+        _budget.record_request()
+        primary_task = asyncio.create_task(
+            _timed(self.model_name, self.primary.get_response(*args, **kwargs))
+        )
+        hedge_task = None
+
+        try:
+            done, _ = await asyncio.wait({primary_task}, timeout=_latencies.hedge_delay(self.model_name))
+            if done:
+                return primary_task.result()
+
+            if not _budget.try_spend():
+                MODEL_HEDGES.inc(model=self.model_name, outcome="over_budget")
+                return await primary_task
+
+            MODEL_HEDGES.inc(model=self.model_name, outcome="fired")
+            hedge_task = asyncio.create_task(
+                _timed(self.hedge_name, self.hedge.get_response(*args, **kwargs))
+            )
+
+            pending = {primary_task, hedge_task}
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                winner = next((task for task in done if task.exception() is None), None)
+                if winner is not None:
+                    MODEL_HEDGES.inc(
+                        model=self.model_name,
+                        outcome="won" if winner is hedge_task else "lost"
+                    )
+                    return winner.result()
+
+            # Both requests failed, surface the primary's error
+            return primary_task.result()
+        finally:
+            for task in (primary_task, hedge_task):
+                if task is not None and not task.done():
+                    task.cancel()
+
+    def stream_response(self, *args, **kwargs) -> AsyncIterator:
+        return self.primary.stream_response(*args, **kwargs)
+
+
+class HedgedModelProvider(ModelProvider):
+    def __init__(self, provider: ModelProvider | None = None):
+        self.provider = provider or MultiProvider()
+
+    def get_model(self, model_name: str | None) -> Model:
+        primary = self.provider.get_model(model_name)
+        hedge_name = MODEL.get(MODEL_HEDGE_FALLBACK_TIER) or model_name
+        hedge = primary if hedge_name == model_name else self.provider.get_model(hedge_name)
+
+        return HedgedModel(model_name or "default", primary, hedge, hedge_name or "default")
+
+
+# Shared so hedged runs reuse one OpenAI client and its connections
+HEDGED_PROVIDER = HedgedModelProvider()
+
+
+def get_model_provider() -> ModelProvider:
+    """Provider for `RunConfig.model_provider`, hedged when MODEL_HEDGING is on"""
+    return HEDGED_PROVIDER if MODEL_HEDGING else MultiProvider()
@@ -0,0 +1,82 @@
+import asyncio
+import logging
+import os
+
+import httpx
+from agents import set_default_openai_client
+from dotenv import load_dotenv
+from openai import AsyncOpenAI, DefaultAsyncHttpxClient
+
+
+load_dotenv()
+
+
+logger = logging.getLogger("OpenAI Client")
+
+
+OPENAI_MAX_CONNECTIONS = int(os.getenv("OPENAI_MAX_CONNECTIONS", "100"))
+# Idle connections kept open so bursts of requests skip the TCP/TLS handshake
+OPENAI_MAX_KEEPALIVE = int(os.getenv("OPENAI_MAX_KEEPALIVE", "20"))
+OPENAI_KEEPALIVE_EXPIRY = float(os.getenv("OPENAI_KEEPALIVE_EXPIRY", "120"))
+OPENAI_TIMEOUT = float(os.getenv("OPENAI_TIMEOUT", "30"))
+# Connections opened at startup, 0 disables the warm-up
+OPENAI_WARMUP_CONNECTIONS = int(os.getenv("OPENAI_WARMUP_CONNECTIONS", "2"))
+
+
+_client: AsyncOpenAI | None = None
+
+
+def init_openai_client() -> AsyncOpenAI:
+    """
+    Create the worker's shared client. The agents SDK uses it as well, so
+    model calls and embeddings share one connection pool.
+    """
+    global _client
+    _client = AsyncOpenAI(
+        api_key=os.getenv("OPENAI_API_KEY"),
+        timeout=httpx.Timeout(OPENAI_TIMEOUT, connect=5.0),
+        http_client=DefaultAsyncHttpxClient(
+            limits=httpx.Limits(
+                max_connections=OPENAI_MAX_CONNECTIONS,
+                max_keepalive_connections=OPENAI_MAX_KEEPALIVE,
+                keepalive_expiry=OPENAI_KEEPALIVE_EXPIRY,
+            )
+        ),
+    )
+    set_default_openai_client(_client, use_for_tracing=False)
+
+    return _client
+
+
+def get_openai_client() -> AsyncOpenAI:
+    """Shared client, created on first use when running outside the app (scripts, offline reports)"""
+    if _client is None:
+        return init_openai_client()
+    return _client
+
+
+async def warm_up_openai_client():
+    if not OPENAI_WARMUP_CONNECTIONS:
+        return
+
+    client = get_openai_client()
+    results = await asyncio.gather(
+        *(client.models.list() for _ in range(OPENAI_WARMUP_CONNECTIONS)),
+        return_exceptions=True
+    )
+
+    failed = [result for result in results if isinstance(result, BaseException)]
+    if failed:
+        logger.warning(f"OpenAI warm-up failed for {len(failed)} connections: {failed[0]!r}")
+    else:
+        logger.info(f"Warmed up {OPENAI_WARMUP_CONNECTIONS} OpenAI connections")
+
+
+async def close_openai_client():
+    global _client
+    if _client is None:
+        return
+
+    logger.info("Closing OpenAI client...")
+    await _client.close()
+    _client = None
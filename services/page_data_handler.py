@@ -1,16 +1,46 @@
+import asyncio
 import regex as re
 import time
 from services.mongo_db import fetch_page_data_using_slug
 from logging import Logger
-from services.redis_service import redis_client
-from redis import Redis
-import json
+from services import metrics
+from services.tiered_cache import TieredCache
 from urllib.parse import urlparse
 
 
 logger = Logger("Cache Logger")
 
 
+# How long the first model turn may wait for a prefetch that is still running
+PREFETCH_WAIT_TIMEOUT = 2.0
+
+PREFETCH_RESULTS = metrics.counter(
+    "page_prefetch_total",
+    "Page data prefetches started for course pages, by outcome"
+)
+PREFETCH_USAGE = metrics.counter(
+    "page_prefetch_usage_total",
+    "Runs where prefetched page data was available, by whether the model still called the page tool"
+)
+TOOL_ROUND_TRIPS_SAVED = metrics.counter(
+    "tool_round_trips_saved_total",
+    "Estimated model round trips avoided by handing prefetched data to the agent"
+)
+
+
+# Hot course pages are served from memory, the short local TTL bounds staleness across workers
+PAGE_CACHE = TieredCache("page", "page:course", ttl=3600, local_ttl=60)
+
+
+def build_page_entry(slug: str, data: dict, source: str) -> dict:
+    return {
+        "slug": slug,
+        "data": data,
+        "source": source,
+        "updated_at": int(time.time()),
+    }
+
+
 async def get_last_page_segment(url: str)-> str:
     path = urlparse(url).path.rstrip("/")
     return path.split("/")[-1]
@@ -36,31 +66,87 @@ async def extract_page_info_from_url(page_url: str) -> dict:
     return {"page_type": "home_page"}
 
 
-async def resolve_page_data_by_slug(slug: str):
-    key = f"page:course:{slug}"
+def get_course_document(page_data) -> dict | None:
+    """
+    The course document out of page data in either shape `resolve_page_data_by_slug`
+    returns: the cached entry wraps the Mongo result under "data", and the Mongo
+    result is the list of documents matching the slug.
+    """
+    if isinstance(page_data, dict) and "data" in page_data and "source" in page_data:
+        page_data = page_data["data"]
+
+    if isinstance(page_data, list):
+        page_data = page_data[0] if page_data else None
+
+    return page_data if isinstance(page_data, dict) else None
 
-    # print("Cache Hit for page resolve")
-    cached = await redis_client.get(key)
+
+async def resolve_page_data_by_slug(slug: str):
+    cached = await PAGE_CACHE.get(slug)
     if cached:
         logger.info(
             "Cache hit, returning cached page data"
         )
-        # print(cached)
-        return json.loads(cached), "cache"
+        return cached, "cache"
 
     page_data = await fetch_page_data_using_slug(slug)
     if not page_data:
         return None, None
 
-    await redis_client.set(
-        key,
-        json.dumps({
-            "slug": slug,
-            "data": page_data,
-            "source": "mongo_db",
-            "updated_at": int(time.time()),
-        }),
-        ex=3600
-    )
+    await PAGE_CACHE.set(slug, build_page_entry(slug, page_data, "mongo_db"))
 
     return page_data, "db"
+
+
+async def prefetch_page_data(slug: str) -> dict | None:
+    try:
+        page_data, source = await resolve_page_data_by_slug(slug)
+    except Exception:
+        logger.exception(f"Page prefetch failed for {slug}")
+        PREFETCH_RESULTS.inc(outcome="error")
+        return None
+
+    PREFETCH_RESULTS.inc(outcome=source or "empty")
+    return page_data
+
+
+def start_page_prefetch(context_data: dict) -> None:
+    """
+    Kick off the page lookup for a course page so it runs alongside the guardrail.
+    The task is kept in the run context and awaited by the agent instructions.
+    """
+    page_context = context_data.get("page_context") or {}
+    slug = page_context.get("slug")
+
+    if page_context.get("page_type") != "particular_course_page" or not slug:
+        return
+
+    context_data["page_prefetch"] = {
+        "slug": slug,
+        "task": asyncio.create_task(prefetch_page_data(slug)),
+    }
+
+
+async def get_prefetched_page_data(context_data: dict | None, slug: str | None = None) -> dict | None:
+    prefetch = (context_data or {}).get("page_prefetch")
+    if not prefetch or (slug is not None and prefetch["slug"] != slug):
+        return None
+
+    try:
+        return await asyncio.wait_for(asyncio.shield(prefetch["task"]), PREFETCH_WAIT_TIMEOUT)
+    except asyncio.TimeoutError:
+        PREFETCH_RESULTS.inc(outcome="timeout")
+        return None
+
+
+def record_prefetch_usage(context_data: dict, tool_names: list[str]) -> None:
+    prefetch = context_data.get("page_prefetch")
+    if not prefetch or not prefetch["task"].done() or not prefetch["task"].result():
+        return
+
+    if "get_current_page_data_using_slug" in tool_names:
+        PREFETCH_USAGE.inc(outcome="miss")
+        return
+
+    PREFETCH_USAGE.inc(outcome="hit")
+    TOOL_ROUND_TRIPS_SAVED.inc()
@@ -26,6 +26,8 @@ from agents.memory.session import SessionABC
 import os
 from dotenv import load_dotenv
 
+from services.session_compaction import compact_tool_outputs
+
 logger = logging.getLogger("SQLAlchemy")
 load_dotenv()
 
@@ -179,7 +181,7 @@ class SQLAlchemySession(SessionABC):
 
         payload = [
                 {"session_id": self.session_id, "message_data": json.dumps(i)}
-                for i in items if not isinstance(items, dict)
+                for i in compact_tool_outputs(items) if not isinstance(items, dict)
             ]
 
 
@@ -0,0 +1,45 @@
+import hashlib
+import logging
+
+from agents import Usage
+
+from services import metrics
+
+
+logger = logging.getLogger("Prompt Cache")
+
+
+INPUT_TOKENS = metrics.counter(
+    "llm_input_tokens_total",
+    "Model input tokens per agent, split into prompt-cache hits and uncached tokens"
+)
+CACHE_HIT_RATIO = metrics.histogram(
+    "prompt_cache_hit_ratio",
+    "Share of a run's input tokens served from the provider prompt cache",
+    buckets=(0, 0.1, 0.25, 0.5, 0.75, 0.9, 1)
+)
+
+
+def prompt_cache_args(agent_name: str, static_prefix: str) -> dict:
+    """
+    `ModelSettings.extra_args` that route every request of one agent to the
+    same prompt cache. The prefix hash rolls the key over when the prompt changes.
+    """
+    digest = hashlib.sha1(static_prefix.encode()).hexdigest()[:8]
+    return {"prompt_cache_key": f"{agent_name.lower().replace(' ', '-')}:{digest}"}
+
+
+def record_run_usage(agent_name: str, usage: Usage, session_id: str | None = None):
+    cached = usage.input_tokens_details.cached_tokens or 0
+    uncached = max(usage.input_tokens - cached, 0)
+
+    INPUT_TOKENS.inc(cached, agent=agent_name, cache="hit")
+    INPUT_TOKENS.inc(uncached, agent=agent_name, cache="miss")
+    if usage.input_tokens:
+        CACHE_HIT_RATIO.observe(cached / usage.input_tokens, agent=agent_name)
+
+    logger.info(
+        f"{agent_name} usage{f' for {session_id}' if session_id else ''}: "
+        f"{usage.requests} requests, {usage.input_tokens} input tokens "
+        f"({cached} cached / {uncached} uncached), {usage.output_tokens} output tokens"
+    )
@@ -25,12 +25,23 @@ redis_client  = Redis(
     protocol=3
 )
 
+# Same server, raw bytes responses for binary values such as packed embeddings
+redis_binary_client = Redis(
+    host=REDIS_HOST,
+    port=REDIS_PORT,
+    password=REDIS_PASSWORD,
+    username=REDIS_USERNAME,
+    decode_responses=False,
+    protocol=3
+)
+
 REDIS_URL=f"redis://{REDIS_USERNAME}:{REDIS_PASSWORD}@{REDIS_HOST}:{REDIS_PORT}"
 
 
 async def disconnect_redis():
     logger.info(f"Disconnecting Redis Client...")
     await redis_client.aclose()
+    await redis_binary_client.aclose()
     logger.info(f"Redis Client Disconnected")
 
 
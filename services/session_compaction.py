@@ -0,0 +1,168 @@
+import ast
+import json
+import logging
+import os
+import sys
+
+from agents import TResponseInputItem
+from dotenv import load_dotenv
+
+from services import metrics
+from services.data_handler import count_item_tokens, extract_text
+
+
+load_dotenv()
+
+
+logger = logging.getLogger("Session Compaction")
+
+
+SESSION_COMPACTION_ENABLED = os.getenv("SESSION_COMPACTION", 'True') == 'True'
+# Tools whose results are course records that can be looked up again by slug
+SESSION_COMPACT_TOOLS = {
+    name.strip()
+    for name in os.getenv(
+        "SESSION_COMPACT_TOOLS",
+        "get_similar_course_chunks,get_current_page_data_using_slug,get_current_page_details"
+    ).split(",")
+    if name.strip()
+}
+# Short outputs (lead confirmations, empty results) are not worth rewriting
+SESSION_COMPACT_MIN_CHARS = int(os.getenv("SESSION_COMPACT_MIN_CHARS", "200"))
+
+COMPACTED_NOTE = "Earlier tool result reduced to course slugs and titles, fetch the course again for details"
+
+
+COMPACTED_BYTES = metrics.counter(
+    "session_compacted_bytes_total",
+    "Bytes of tool output written to session history, before and after compaction"
+)
+
+
+def parse_tool_output(output: str):
+    """Tool results are stored as JSON or as `str()` of a Python dict/list"""
+    try:
+        return json.loads(output)
+    except (json.JSONDecodeError, TypeError):
+        pass
+
+    try:
+        return ast.literal_eval(output)
+    except (ValueError, SyntaxError, MemoryError, RecursionError):
+        return None
+
+
+def collect_course_refs(value, refs: list[dict], seen: set[str]):
+    if isinstance(value, dict):
+        slug = value.get("slug")
+        if isinstance(slug, str) and slug and slug not in seen:
+            seen.add(slug)
+            title = value.get("course_title") or value.get("title")
+            refs.append({"slug": slug, "title": extract_text(title) if title else ""})
+            return
+
+        for nested in value.values():
+            collect_course_refs(nested, refs, seen)
+
+    elif isinstance(value, list):
+        for nested in value:
+            collect_course_refs(nested, refs, seen)
+
+
+def compact_output(output: str) -> str | None:
+    """Slug and title of every course in a tool result, `None` when nothing can be kept"""
+    parsed = parse_tool_output(output)
+    if parsed is None:
+        return None
+
+    refs: list[dict] = []
+    collect_course_refs(parsed, refs, set())
+    if not refs:
+        return None
+
+    return json.dumps({"note": COMPACTED_NOTE, "courses": refs})
+
+
+def compact_tool_outputs(items: list[TResponseInputItem]) -> list[TResponseInputItem]:
+    """
+    Rewrite course-record tool outputs in `items` down to slugs and titles before
+    they are persisted.
+
+    The SDK keeps the running turn's tool outputs in memory and only reads the
+    session when the next request starts, so the turn that called a tool still
+    answers from the full result, later turns replay the compact one.
+    """
+    if not SESSION_COMPACTION_ENABLED:
+        return items
+
+    tool_names = {
+        item.get("call_id"): item.get("name")
+        for item in items
+        if item.get("type") == "function_call"
+    }
+
+    compacted = []
+    for item in items:
+        output = item.get("output")
+        if (
+            item.get("type") != "function_call_output"
+            or not isinstance(output, str)
+            or len(output) < SESSION_COMPACT_MIN_CHARS
+            or tool_names.get(item.get("call_id")) not in SESSION_COMPACT_TOOLS
+        ):
+            compacted.append(item)
+            continue
+
+        compact = compact_output(output)
+        if compact is None or len(compact) >= len(output):
+            compacted.append(item)
+            continue
+
+        COMPACTED_BYTES.inc(len(output), stage="before")
+        COMPACTED_BYTES.inc(len(compact), stage="after")
+        compacted.append({**item, "output": compact})
+
+    return compacted
+
+
+def build_compaction_report(sessions: list[list[TResponseInputItem]]) -> dict:
+    """
+    Replayed-history tokens of stored sessions with and without compaction.
+
+    Every stored turn is replayed on each later request, so the replayed
+    total of a session is the sum over its turns of the history before them.
+    """
+    report = {"sessions": len(sessions), "stored_before": 0, "stored_after": 0,
+              "replayed_before": 0, "replayed_after": 0}
+
+    for items in sessions:
+        turns: list[list[TResponseInputItem]] = []
+        for item in items:
+            if item.get("role") == "user" or not turns:
+                turns.append([])
+            turns[-1].append(item)
+
+        history_before = history_after = 0
+        for turn in turns:
+            report["replayed_before"] += history_before
+            report["replayed_after"] += history_after
+            history_before += sum(count_item_tokens(item) for item in turn)
+            history_after += sum(count_item_tokens(item) for item in compact_tool_outputs(turn))
+
+        report["stored_before"] += history_before
+        report["stored_after"] += history_after
+
+    for stage in ("stored", "replayed"):
+        before = report[f"{stage}_before"]
+        report[f"{stage}_saved_ratio"] = round(1 - report[f"{stage}_after"] / before, 3) if before else 0.0
+
+    return report
+
+
+if __name__ == "__main__":
+    # Corpus: one exported session per line, as a JSON list of `message_data` items
+    #   python -m services.session_compaction sessions.jsonl
+    with open(sys.argv[1]) as corpus:
+        exported = [json.loads(line) for line in corpus if line.strip()]
+
+    print(json.dumps(build_compaction_report(exported), indent=2))
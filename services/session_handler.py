@@ -3,6 +3,7 @@ import os
 import json
 import threading
 from agents.memory.sqlite_session import SQLiteSession
+from agents.memory.session import SessionABC
 # from agents.extensions.memory import SQLAlchemySession
 from dotenv import load_dotenv
 import logging
@@ -50,3 +51,57 @@ class SessionManager:
         """Close session"""
         await close_session(self.session)
         return None
+
+
+class BufferedSession(SessionABC):
+    """
+    Holds writes made during a run in memory until the caller decides
+    whether the turn should be committed to the wrapped session or dropped.
+    """
+
+    def __init__(self, session: SessionABC):
+        self.session = session
+        self.session_id = session.session_id
+        self._batches: list[list] = []
+
+    async def get_items(self, limit: int | None = None):
+        items = await self.session.get_items() + self.pending_items
+        if limit is not None:
+            return items[-limit:] if limit > 0 else []
+        return items
+
+    async def add_items(self, items):
+        if not items:
+            return
+        self._batches.append(list(items))
+
+    async def pop_item(self):
+        while self._batches:
+            batch = self._batches[-1]
+            if batch:
+                return batch.pop()
+            self._batches.pop()
+        return await self.session.pop_item()
+
+    async def clear_session(self) -> None:
+        self._batches.clear()
+        await self.session.clear_session()
+
+    @property
+    def pending_items(self) -> list:
+        return [item for batch in self._batches for item in batch]
+
+    async def commit(self) -> None:
+        """Flush every buffered write to the wrapped session"""
+        items = self.pending_items
+        self._batches.clear()
+        await self.session.add_items(items)
+
+    async def rollback(self, keep_input: bool = True) -> None:
+        """
+        Drop the buffered run items. The runner always saves the user input
+        as its first write, which is kept by default so the history stays coherent.
+        """
+        input_items = self._batches[0] if keep_input and self._batches else []
+        self._batches.clear()
+        await self.session.add_items(input_items)
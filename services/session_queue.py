@@ -0,0 +1,184 @@
+import asyncio
+import logging
+import time
+from contextlib import asynccontextmanager
+from typing import Any, Awaitable, Callable
+
+from redis.exceptions import LockError
+
+from services import metrics
+from services.redis_service import redis_client
+
+
+logger = logging.getLogger("Session Queue")
+
+
+LOCK_TIMEOUT = 60                       # lock TTL, renewed while the run is still alive
+LOCK_RENEW_INTERVAL = LOCK_TIMEOUT / 3
+QUEUE_WAIT_TIMEOUT = 30                 # max wait for a lock held by another worker
+DISCONNECT_POLL_INTERVAL = 0.5          # how often a waiting request checks that its client is still there
+
+
+QUEUE_DEPTH = metrics.gauge(
+    "session_queue_depth",
+    "Requests currently waiting for their session turn on this worker"
+)
+QUEUE_DEPTH_ON_ENQUEUE = metrics.histogram(
+    "session_queue_depth_on_enqueue",
+    "Number of requests already waiting for the same session when a request arrives",
+    buckets=(0, 1, 2, 3, 5, 10)
+)
+QUEUE_WAIT_SECONDS = metrics.histogram(
+    "session_queue_wait_seconds",
+    "Time a request waited before its session turn started"
+)
+QUEUE_DEDUPLICATED = metrics.counter(
+    "session_queue_deduplicated_total",
+    "Requests that joined an identical in-flight request instead of running again"
+)
+LOCK_RENEWALS = metrics.counter(
+    "session_lock_renewals_total",
+    "Session lock TTL renewals for long running turns"
+)
+TURNS_CANCELLED = metrics.counter(
+    "session_turns_cancelled_total",
+    "Queued or running turns cancelled because every client waiting for them disconnected"
+)
+
+
+class SessionBusyError(Exception):
+    """Raised when the session lock could not be taken within QUEUE_WAIT_TIMEOUT"""
+
+
+class ClientDisconnectedError(Exception):
+    """Raised to a request whose client went away before its turn finished"""
+
+
+_session_locks: dict[str, asyncio.Lock] = {}
+_session_waiters: dict[str, int] = {}
+_inflight: dict[str, asyncio.Task] = {}
+_inflight_clients: dict[str, int] = {}
+
+
+async def _renew_lock(lock, session_id: str):
+    while True:
+        await asyncio.sleep(LOCK_RENEW_INTERVAL)
+        try:
+            await lock.reacquire()
+            LOCK_RENEWALS.inc()
+        except LockError:
+            logger.warning(f"Lost session lock for {session_id} while the turn was running")
+            return
+
+
+@asynccontextmanager
+async def hold_session_lock(session_id: str):
+    """Cross-worker Redis lock that keeps extending itself until the block exits"""
+    lock = redis_client.lock(
+        f"lock:session:{session_id}",
+        timeout=LOCK_TIMEOUT,
+        blocking_timeout=QUEUE_WAIT_TIMEOUT
+    )
+
+    if not await lock.acquire():
+        raise SessionBusyError(f"Session {session_id} is busy")
+
+    renew_task = asyncio.create_task(_renew_lock(lock, session_id))
+    try:
+        yield lock
+    finally:
+        renew_task.cancel()
+        try:
+            await lock.release()
+        except LockError:
+            logger.warning(f"Session lock for {session_id} expired before release")
+
+
+@asynccontextmanager
+async def session_turn(session_id: str):
+    """
+    Wait for this session's turn. Requests on the same worker are served in
+    arrival order (asyncio.Lock is FIFO), the Redis lock keeps other workers out.
+    """
+    local_lock = _session_locks.setdefault(session_id, asyncio.Lock())
+    waiting = _session_waiters.get(session_id, 0)
+    QUEUE_DEPTH_ON_ENQUEUE.observe(waiting)
+
+    _session_waiters[session_id] = waiting + 1
+    QUEUE_DEPTH.inc()
+    enqueued_at = time.perf_counter()
+    dequeued = False
+
+    try:
+        async with local_lock:
+            _session_waiters[session_id] -= 1
+            QUEUE_DEPTH.dec()
+            dequeued = True
+
+            async with hold_session_lock(session_id):
+                QUEUE_WAIT_SECONDS.observe(time.perf_counter() - enqueued_at)
+                yield
+    finally:
+        if not dequeued:
+            _session_waiters[session_id] -= 1
+            QUEUE_DEPTH.dec()
+
+        if _session_waiters.get(session_id) == 0 and not local_lock.locked():
+            _session_waiters.pop(session_id, None)
+            _session_locks.pop(session_id, None)
+
+
+async def _run_turn(session_id: str, handler: Callable[[], Awaitable[Any]]):
+    async with session_turn(session_id):
+        return await handler()
+
+
+async def _wait_for_turn(task: asyncio.Task, is_disconnected: Callable[[], Awaitable[bool]] | None) -> Any:
+    if is_disconnected is None:
+        return await asyncio.shield(task)
+
+    while True:
+        done, _ = await asyncio.wait({task}, timeout=DISCONNECT_POLL_INTERVAL)
+        if done:
+            return task.result()
+        if await is_disconnected():
+            raise ClientDisconnectedError()
+
+
+async def run_in_session_queue(
+        session_id: str,
+        request_key: str,
+        handler: Callable[[], Awaitable[Any]],
+        is_disconnected: Callable[[], Awaitable[bool]] | None = None
+) -> Any:
+    """
+    Run `handler` in the session's FIFO queue. A request whose key matches one
+    that is still queued or running shares that request's result.
+
+    With `is_disconnected`, the turn is cancelled (releasing the session lock)
+    once every client waiting for it has gone away.
+    """
+    inflight_key = f"{session_id}:{request_key}"
+
+    task = _inflight.get(inflight_key)
+    if task is not None:
+        QUEUE_DEDUPLICATED.inc()
+        logger.info(f"Joining in-flight request for session {session_id}")
+    else:
+        task = asyncio.create_task(_run_turn(session_id, handler))
+        _inflight[inflight_key] = task
+        task.add_done_callback(lambda _: _inflight.pop(inflight_key, None))
+
+    _inflight_clients[inflight_key] = _inflight_clients.get(inflight_key, 0) + 1
+    try:
+        return await _wait_for_turn(task, is_disconnected)
+    except ClientDisconnectedError:
+        if _inflight_clients[inflight_key] == 1 and not task.done():
+            task.cancel()
+            TURNS_CANCELLED.inc()
+            logger.info(f"Cancelled turn for session {session_id}, client disconnected")
+        raise
+    finally:
+        _inflight_clients[inflight_key] -= 1
+        if not _inflight_clients[inflight_key]:
+            _inflight_clients.pop(inflight_key, None)
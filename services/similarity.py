@@ -1,11 +1,19 @@
+import asyncio
 import json
 import logging
 import os
+import statistics
+import sys
+import time
+import numpy as np
 from dotenv import load_dotenv
-from openai import OpenAI
+from services import metrics
 from services.data_handler import normalize_query
-from services.redis_service import redis_client
-from services.weaviate_service import fetch_similar_courses
+from services.openai_client import get_openai_client
+from services.redis_service import redis_binary_client, redis_client
+from services.tiered_cache import TieredCache
+from services.vector_index import VECTOR_INDEX_MODE, VectorIndexMode, get_vector_index, load_vector_index
+from services.weaviate_service import close_weaviate, fetch_similar_courses, init_weaviate
 
 load_dotenv()
 
@@ -13,44 +21,286 @@ load_dotenv()
 logger = logging.Logger("Redis Logger")
 
 
-client=OpenAI(
-    api_key=os.getenv("OPENAI_API_KEY"),
+EMBEDDING_MODEL = "text-embedding-3-small"
+# Shorter vectors from the model's `dimensions` parameter, 0 keeps the native size.
+# The course collection has to be re-ingested after changing it.
+EMBEDDING_DIMENSIONS = int(os.getenv("EMBEDDING_DIMENSIONS", "0"))
+EMBEDDING_CACHE_TTL = 3600
+# Read (and convert) query embeddings still cached as JSON text under emb:<query>.
+# Costs an extra GET per miss, only worth turning on for the first hour after a
+# deploy, once EMBEDDING_CACHE_TTL has passed the old keys are gone.
+EMBEDDING_CACHE_READ_JSON = os.getenv("EMBEDDING_CACHE_READ_JSON", 'False') == 'True'
+# Query embeddings are cached as packed little-endian float32
+EMBEDDING_DTYPE = np.dtype("<f4")
+
+# Results only change when the collection is synced
+SIMILARITY_CACHE = TieredCache("similarity", "weaviate:similarity", ttl=1800, local_ttl=300, local_max_entries=512)
+# Concurrent query embeddings are coalesced into one request for up to this long, or until the batch is full
+EMBEDDING_BATCH_MAX_WAIT_MS = float(os.getenv("EMBEDDING_BATCH_MAX_WAIT_MS", "5"))
+EMBEDDING_BATCH_MAX_SIZE = int(os.getenv("EMBEDDING_BATCH_MAX_SIZE", "32"))
+
+
+EMBEDDING_BATCH_SIZE = metrics.histogram(
+    "embedding_batch_size",
+    "Distinct queries sent per coalesced embeddings request",
+    buckets=(1, 2, 4, 8, 16, 32, 64)
+)
+EMBEDDING_BATCH_WAIT = metrics.histogram(
+    "embedding_batch_wait_seconds",
+    "Time the first query of a batch waited before the embeddings request was sent",
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1)
+)
+EMBEDDING_BATCH_DEDUPLICATED = metrics.counter(
+    "embedding_batch_deduplicated_total",
+    "Query embeddings that shared an identical query already waiting in the batch"
 )
+EMBEDDING_CACHE_RESULTS = metrics.counter(
+    "embedding_cache_total",
+    "Query embedding cache lookups by outcome (hit, miss, migrated from JSON)"
+)
+COURSE_SEARCHES = metrics.counter(
+    "course_search_total",
+    "Similar course searches by the engine that answered them"
+)
+
+
+async def embed_texts(texts: list[str]) -> list[list[float]]:
+    response = await get_openai_client().embeddings.create(
+        input=texts,
+        model=EMBEDDING_MODEL,
+        encoding_format="float",
+        **({"dimensions": EMBEDDING_DIMENSIONS} if EMBEDDING_DIMENSIONS else {})
+    )
+    return [item.embedding for item in response.data]
+
+
+class EmbeddingBatcher:
+    """
+    Coalesces concurrent single-query embeddings into one multi-input request.
+    Queries are keyed by their normalized form, identical ones in a batch are
+    embedded once and every caller gets the vector.
+    """
+
+    def __init__(self, max_size: int = EMBEDDING_BATCH_MAX_SIZE, max_wait: float = EMBEDDING_BATCH_MAX_WAIT_MS / 1000):
+        self.max_size = max_size
+        self.max_wait = max_wait
+        self._texts: dict[str, str] = {}
+        self._waiters: dict[str, list[asyncio.Future]] = {}
+        self._opened_at = 0.0
+        self._timer: asyncio.TimerHandle | None = None
+
+    async def embed(self, key: str, text: str) -> list[float]:
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+
+        if key in self._waiters:
+            EMBEDDING_BATCH_DEDUPLICATED.inc()
+            self._waiters[key].append(future)
+        else:
+            if not self._waiters:
+                self._opened_at = time.perf_counter()
+                self._timer = loop.call_later(self.max_wait, self._flush)
+            self._texts[key] = text
+            self._waiters[key] = [future]
+
+            if len(self._waiters) >= self.max_size:
+                self._flush()
+
+        return await future
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if not self._waiters:
+            return
+
+        texts, waiters = self._texts, self._waiters
+        self._texts, self._waiters = {}, {}
+
+        EMBEDDING_BATCH_WAIT.observe(time.perf_counter() - self._opened_at)
+        EMBEDDING_BATCH_SIZE.observe(len(texts))
+        asyncio.get_running_loop().create_task(self._send(texts, waiters))
+
+    @staticmethod
+    async def _send(texts: dict[str, str], waiters: dict[str, list[asyncio.Future]]):
+        try:
+            vectors = await embed_texts(list(texts.values()))
+        except Exception as e:
+            for futures in waiters.values():
+                for future in futures:
+                    if not future.done():
+                        future.set_exception(e)
+            return
+
+        for key, vector in zip(texts, vectors):
+            for future in waiters[key]:
+                if not future.done():
+                    future.set_result(vector)
+
+
+_embedding_batcher = EmbeddingBatcher()
+
+
+def embedding_key(normalized_query: str) -> str:
+    return f"emb:f32:{EMBEDDING_DIMENSIONS or 'full'}:{normalized_query}"
+
+
+def pack_embedding(vector) -> bytes:
+    return np.asarray(vector, dtype=EMBEDDING_DTYPE).tobytes()
+
+
+def unpack_embedding(data: bytes) -> np.ndarray:
+    """Zero-copy (read-only) view over the cached bytes"""
+    return np.frombuffer(data, dtype=EMBEDDING_DTYPE)
+
+
+async def get_legacy_embedding(normalized_query: str) -> np.ndarray | None:
+    """Entries cached as JSON text before the binary format are moved over on first read"""
+    if not EMBEDDING_CACHE_READ_JSON or EMBEDDING_DIMENSIONS:
+        return None
+
+    legacy_key = f"emb:{normalized_query}"
+    cached = await redis_client.get(legacy_key)
+    if not cached:
+        return None
+
+    vector = np.asarray(json.loads(cached), dtype=EMBEDDING_DTYPE)
+    await redis_binary_client.set(embedding_key(normalized_query), vector.tobytes(), ex=EMBEDDING_CACHE_TTL)
+    await redis_client.delete(legacy_key)
+    return vector
+
+
+async def get_query_embedding(query: str) -> np.ndarray:
+    normalized_query = normalize_query(query)
+    emb_key = embedding_key(normalized_query)
+    cached = await redis_binary_client.get(emb_key)
+
+    if cached:
+        EMBEDDING_CACHE_RESULTS.inc(outcome="hit")
+        return unpack_embedding(cached)
+
+    legacy_embedding = await get_legacy_embedding(normalized_query)
+    if legacy_embedding is not None:
+        EMBEDDING_CACHE_RESULTS.inc(outcome="migrated")
+        return legacy_embedding
+
+    EMBEDDING_CACHE_RESULTS.inc(outcome="miss")
+    query_embedding = np.asarray(
+        await _embedding_batcher.embed(normalized_query, query),
+        dtype=EMBEDDING_DTYPE
+    )
+    await redis_binary_client.set(emb_key, query_embedding.tobytes(), ex=EMBEDDING_CACHE_TTL)
+
+    return query_embedding
+
+
+def cosine_similarity(a, b) -> float:
+    a = np.asarray(a, dtype=np.float32)
+    b = np.asarray(b, dtype=np.float32)
+    norm_a = np.linalg.norm(a)
+    norm_b = np.linalg.norm(b)
+    if not norm_a or not norm_b:
+        return 0.0
+    return float(a @ b / (norm_a * norm_b))
+
+
+async def search_courses(query: str, query_embedding: np.ndarray) -> list[dict]:
+    """Hybrid course search on Weaviate or the in-process index, depending on VECTOR_INDEX"""
+    index = get_vector_index()
+    if VECTOR_INDEX_MODE == VectorIndexMode.primary and index is not None:
+        COURSE_SEARCHES.inc(engine="local")
+        return index.search(query, query_embedding)
+
+    try:
+        output = await fetch_similar_courses(query, query_embedding)
+    except Exception:
+        if VECTOR_INDEX_MODE != VectorIndexMode.fallback or index is None:
+            raise
+        logger.exception("Weaviate search failed, answering from the in-process index")
+        COURSE_SEARCHES.inc(engine="local_fallback")
+        return index.search(query, query_embedding)
+
+    COURSE_SEARCHES.inc(engine="weaviate")
+    return output
+
 
 async def get_similar_course_chunks(query: str)->list[dict]:
     normalized_query = normalize_query(query)
-    res_key = f"weaviate:similarity:{normalized_query}"
-    cached = await redis_client.get(res_key)
+    cached = await SIMILARITY_CACHE.get(normalized_query)
     if cached:
-        logger.info("Cache hit, returning similar courses from redis")
-        return json.loads(cached)
+        logger.info("Cache hit, returning cached similar courses")
+        return cached
 
     logger.info("Cache miss, returning similar courses from weaviate")
 
-    emb_key = f"emb:{normalized_query}"
-    cached = await redis_client.get(emb_key)
+    query_embedding = await get_query_embedding(query)
 
+    output = await search_courses(query, query_embedding)
 
-    if not cached:
-        query_embedding = client.embeddings.create(
-            input=query,
-            model="text-embedding-3-small",
-            encoding_format="float",
-        ).data[0].embedding
-        await redis_client.set(emb_key, json.dumps(query_embedding), ex=3600)
-    else:
-        query_embedding = json.loads(cached)
-
-    output = await fetch_similar_courses(query, query_embedding)
-
-    await redis_client.set(
-        res_key,
-        json.dumps(output),
-        ex=1800
-    )
+    await SIMILARITY_CACHE.set(normalized_query, output)
 
     return output
 
 
 async def get_course_alternatives():
     pass
+
+
+def top_slugs(results: list[dict]) -> list[str]:
+    return [result["course_details"].get("slug") for result in results]
+
+
+async def compare_engines(queries: list[str]) -> dict:
+    """
+    Offline comparison of the Weaviate hybrid query and the in-process index:
+    latency and overlap of the top-12 slugs per query. Embeddings are computed
+    up front so only the searches are timed.
+    """
+    await init_weaviate()
+    try:
+        await load_vector_index()
+        index = get_vector_index()
+        if index is None:
+            raise RuntimeError("Vector index is off or could not be loaded")
+
+        vectors = await embed_texts(queries)
+        weaviate_seconds, local_seconds, overlaps = [], [], []
+        for query, vector in zip(queries, vectors):
+            start_time = time.perf_counter()
+            remote = await fetch_similar_courses(query, vector)
+            weaviate_seconds.append(time.perf_counter() - start_time)
+
+            start_time = time.perf_counter()
+            local = index.search(query, vector)
+            local_seconds.append(time.perf_counter() - start_time)
+
+            remote_slugs = set(top_slugs(remote))
+            overlaps.append(len(remote_slugs & set(top_slugs(local))) / len(remote_slugs) if remote_slugs else 1.0)
+    finally:
+        await close_weaviate()
+
+    def summarize(seconds: list[float]) -> dict:
+        seconds = sorted(seconds)
+        return {
+            "p50_ms": round(statistics.median(seconds) * 1000, 3),
+            "p95_ms": round(seconds[min(len(seconds) - 1, int(len(seconds) * 0.95))] * 1000, 3),
+        }
+
+    return {
+        "queries": len(queries),
+        "courses": len(index),
+        "weaviate": summarize(weaviate_seconds),
+        "local": summarize(local_seconds),
+        "mean_top12_overlap": round(statistics.mean(overlaps), 3),
+        "min_top12_overlap": round(min(overlaps), 3),
+    }
+
+
+if __name__ == "__main__":
+    # One query per line
+    #   python -m services.similarity queries.txt
+    with open(sys.argv[1]) as corpus:
+        loaded = [line.strip() for line in corpus if line.strip()]
+
+    print(json.dumps(asyncio.run(compare_engines(loaded)), indent=2))
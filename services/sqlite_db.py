@@ -7,6 +7,8 @@ import logging
 
 from agents import SessionABC, TResponseInputItem
 
+from services.session_compaction import compact_tool_outputs
+
 _conn: sqlite3.Connection | None = None
 _db_lock = Lock()
 SQLITE_SESSION_TABLE: str = "agent_sessions"
@@ -148,6 +150,8 @@ class CustomSQLiteSession(SessionABC):
         if not items:
             return
 
+        items = compact_tool_outputs(items)
+
         def _add_items_sync():
             with get_lock():
                 conn = get_conn()
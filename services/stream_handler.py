@@ -0,0 +1,133 @@
+import json
+import logging
+from typing import Any
+
+
+logger = logging.getLogger("Stream Handler")
+
+
+SPEECH_KEY = '"speech"'
+GUARDRAIL_DECISION_KEY = '"guardrail_decision"'
+JSON_ESCAPES = {
+    '"': '"',
+    "\\": "\\",
+    "/": "/",
+    "b": "\b",
+    "f": "\f",
+    "n": "\n",
+    "r": "\r",
+    "t": "\t",
+}
+
+
+def format_sse(event: str, data: Any) -> str:
+    """Serialize a single server-sent event frame"""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+class SpeechStreamExtractor:
+    """
+    Incrementally pulls the `speech` string (or another string field given
+    by `key`) out of a structured output that is being streamed as raw JSON
+    text deltas.
+
+    Only the decoded characters that have not been returned before are
+    emitted by `feed`, so the caller can forward them as-is.
+    """
+
+    def __init__(self, key: str = SPEECH_KEY):
+        self.key = key
+        self.reset()
+
+    def reset(self):
+        self._buffer = ""
+        self._position = 0
+        self._in_speech = False
+        self._done = False
+
+    @property
+    def done(self) -> bool:
+        """The field's closing quote has been read, or the field is not a string"""
+        return self._done
+
+    def feed(self, delta: str) -> str:
+        if self._done or not delta:
+            return ""
+
+        self._buffer += delta
+
+        if not self._in_speech:
+            key_index = self._buffer.find(self.key)
+            if key_index == -1:
+                return ""
+
+            index = key_index + len(self.key)
+            while index < len(self._buffer) and self._buffer[index] in " \t\r\n:":
+                index += 1
+
+            if index >= len(self._buffer):
+                return ""
+
+            if self._buffer[index] != '"':
+                self._done = True
+                return ""
+
+            self._in_speech = True
+            self._position = index + 1
+
+        return self._decode()
+
+    def _decode(self) -> str:
+        decoded = []
+        buffer = self._buffer
+        index = self._position
+
+        while index < len(buffer):
+            char = buffer[index]
+
+            if char == '"':
+                self._done = True
+                index += 1
+                break
+
+            if char != "\\":
+                decoded.append(char)
+                index += 1
+                continue
+
+            # Wait for the rest of an escape sequence split across deltas
+            if index + 1 >= len(buffer):
+                break
+
+            escape = buffer[index + 1]
+            if escape == "u":
+                if index + 6 > len(buffer):
+                    break
+                try:
+                    code_point = int(buffer[index + 2:index + 6], 16)
+                except ValueError:
+                    index += 6
+                    continue
+
+                # Surrogate pairs arrive as two consecutive \uXXXX escapes
+                if 0xD800 <= code_point <= 0xDBFF:
+                    if index + 12 > len(buffer):
+                        break
+                    if buffer[index + 6:index + 8] == "\\u":
+                        try:
+                            low = int(buffer[index + 8:index + 12], 16)
+                        except ValueError:
+                            low = 0
+                        if 0xDC00 <= low <= 0xDFFF:
+                            code_point = 0x10000 + ((code_point - 0xD800) << 10) + (low - 0xDC00)
+                            index += 6
+
+                decoded.append(chr(code_point))
+                index += 6
+                continue
+
+            decoded.append(JSON_ESCAPES.get(escape, escape))
+            index += 2
+
+        self._position = index
+        return "".join(decoded)
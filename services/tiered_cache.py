@@ -0,0 +1,255 @@
+import asyncio
+import json
+import logging
+import os
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any
+
+from dotenv import load_dotenv
+
+from services import metrics
+from services.redis_service import redis_client
+
+
+load_dotenv()
+
+
+logger = logging.getLogger("Tiered Cache")
+
+
+# In-process tier in front of Redis, off makes every namespace Redis only
+LOCAL_CACHE = os.getenv("LOCAL_CACHE", 'True') == 'True'
+# Evict other workers' local copies over Redis pub/sub when a value is replaced or invalidated.
+# Without it a stale local copy lives at most its namespace's local TTL.
+CACHE_INVALIDATION = os.getenv("CACHE_INVALIDATION", 'False') == 'True'
+CACHE_INVALIDATION_CHANNEL = "cache:invalidate"
+INVALIDATION_RETRY_SECONDS = 1.0
+
+# Tells this worker's own invalidation messages apart
+WORKER_ID = uuid.uuid4().hex
+
+
+CACHE_LOOKUPS = metrics.counter(
+    "tiered_cache_total",
+    "Tiered cache lookups by namespace and the tier that answered (local, redis, miss)"
+)
+CACHE_HIT_RATIO = metrics.gauge(
+    "tiered_cache_hit_ratio",
+    "Share of lookups answered by each tier since startup, by namespace"
+)
+CACHE_LOCAL_ENTRIES = metrics.gauge(
+    "tiered_cache_local_entries",
+    "Entries held in the in-process tier, by namespace"
+)
+CACHE_INVALIDATIONS = metrics.counter(
+    "tiered_cache_invalidations_total",
+    "Local entries evicted by invalidation messages from other workers, by namespace"
+)
+
+
+class LocalLRU:
+    """Bounded LRU with a per-entry TTL, single event loop only"""
+
+    def __init__(self, max_entries: int, ttl: float):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: OrderedDict[str, tuple[float, Any]] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: str) -> tuple[bool, Any]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return False, None
+
+        expires_at, value = entry
+        if expires_at <= time.monotonic():
+            del self._entries[key]
+            return False, None
+
+        self._entries.move_to_end(key)
+        return True, value
+
+    def set(self, key: str, value: Any):
+        self._entries[key] = (time.monotonic() + self.ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def delete(self, key: str) -> bool:
+        return self._entries.pop(key, None) is not None
+
+    def clear(self):
+        self._entries.clear()
+
+
+_caches: dict[str, "TieredCache"] = {}
+
+
+class TieredCache:
+    """
+    JSON values cached in an in-process LRU first and Redis second, under
+    `{prefix}:{key}` in Redis. Local hits hand out the stored object itself,
+    callers must treat cached values as read-only.
+
+    The local tier's size and TTL default to the arguments and can be
+    overridden per namespace with CACHE_<NAMESPACE>_LOCAL_MAX_ENTRIES and
+    CACHE_<NAMESPACE>_LOCAL_TTL.
+    """
+
+    def __init__(
+            self,
+            namespace: str,
+            prefix: str,
+            ttl: int,
+            local_ttl: float,
+            local_max_entries: int = 256
+    ):
+        env_prefix = f"CACHE_{namespace.upper()}"
+        self.namespace = namespace
+        self.prefix = prefix
+        self.ttl = ttl
+        self.local = LocalLRU(
+            max_entries=int(os.getenv(f"{env_prefix}_LOCAL_MAX_ENTRIES", str(local_max_entries))),
+            # Never longer than Redis keeps the value
+            ttl=min(float(os.getenv(f"{env_prefix}_LOCAL_TTL", str(local_ttl))), ttl),
+        )
+        self.local_enabled = LOCAL_CACHE and self.local.max_entries > 0 and self.local.ttl > 0
+        self._lookups = {"local": 0, "redis": 0, "miss": 0}
+
+        _caches[namespace] = self
+
+    def redis_key(self, key: str) -> str:
+        return f"{self.prefix}:{key}"
+
+    def _record(self, tier: str):
+        self._lookups[tier] += 1
+        CACHE_LOOKUPS.inc(namespace=self.namespace, tier=tier)
+
+        total = sum(self._lookups.values())
+        for name, count in self._lookups.items():
+            CACHE_HIT_RATIO.set(count / total, namespace=self.namespace, tier=name)
+
+    def _set_local(self, key: str, value: Any):
+        if self.local_enabled:
+            self.local.set(key, value)
+            CACHE_LOCAL_ENTRIES.set(len(self.local), namespace=self.namespace)
+
+    async def get(self, key: str) -> Any | None:
+        if self.local_enabled:
+            found, value = self.local.get(key)
+            if found:
+                self._record("local")
+                return value
+
+        cached = await redis_client.get(self.redis_key(key))
+        if not cached:
+            self._record("miss")
+            return None
+
+        value = json.loads(cached)
+        self._set_local(key, value)
+        self._record("redis")
+        return value
+
+    async def set(self, key: str, value: Any, broadcast: bool = False):
+        """
+        Store in both tiers. `broadcast` evicts other workers' local copies,
+        for values that replace an existing entry rather than fill a miss.
+        """
+        await redis_client.set(self.redis_key(key), json.dumps(value), ex=self.ttl)
+        self._set_local(key, value)
+
+        if broadcast:
+            await self._publish_invalidation([key])
+
+    async def invalidate(self, *keys: str):
+        """Delete from Redis and from the local tier of every worker"""
+        if not keys:
+            return
+
+        await redis_client.delete(*(self.redis_key(key) for key in keys))
+        self.evict_local(keys)
+        await self._publish_invalidation(list(keys))
+
+    def evict_local(self, keys) -> int:
+        evicted = sum(self.local.delete(key) for key in keys)
+        CACHE_LOCAL_ENTRIES.set(len(self.local), namespace=self.namespace)
+        return evicted
+
+    def clear_local(self):
+        self.local.clear()
+        CACHE_LOCAL_ENTRIES.set(0, namespace=self.namespace)
+
+    async def _publish_invalidation(self, keys: list[str]):
+        if not CACHE_INVALIDATION or not self.local_enabled:
+            return
+
+        await redis_client.publish(CACHE_INVALIDATION_CHANNEL, json.dumps({
+            "origin": WORKER_ID,
+            "namespace": self.namespace,
+            "keys": keys,
+        }))
+
+
+def _handle_invalidation(data: str):
+    payload = json.loads(data)
+    if payload.get("origin") == WORKER_ID:
+        return
+
+    cache = _caches.get(payload.get("namespace"))
+    if cache is None:
+        return
+
+    evicted = cache.evict_local(payload.get("keys", []))
+    if evicted:
+        CACHE_INVALIDATIONS.inc(evicted, namespace=cache.namespace)
+
+
+async def _listen_for_invalidations():
+    while True:
+        pubsub = redis_client.pubsub()
+        try:
+            await pubsub.subscribe(CACHE_INVALIDATION_CHANNEL)
+            # Messages sent while this worker was not subscribed are lost
+            for cache in _caches.values():
+                cache.clear_local()
+
+            async for message in pubsub.listen():
+                if message["type"] == "message":
+                    _handle_invalidation(message["data"])
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            logger.exception("Cache invalidation subscription failed, resubscribing")
+            await asyncio.sleep(INVALIDATION_RETRY_SECONDS)
+        finally:
+            await pubsub.aclose()
+
+
+_listener: asyncio.Task | None = None
+
+
+def start_cache_invalidation():
+    global _listener
+    if not CACHE_INVALIDATION or not LOCAL_CACHE or _listener is not None:
+        return
+
+    _listener = asyncio.create_task(_listen_for_invalidations())
+    logger.info("Listening for cache invalidations")
+
+
+async def stop_cache_invalidation():
+    global _listener
+    if _listener is None:
+        return
+
+    _listener.cancel()
+    try:
+        await _listener
+    except asyncio.CancelledError:
+        pass
+    _listener = None
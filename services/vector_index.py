@@ -0,0 +1,203 @@
+import asyncio
+import logging
+import math
+import os
+import time
+from collections import Counter, defaultdict
+from enum import Enum
+
+import numpy as np
+import regex as re
+from dotenv import load_dotenv
+
+from services import metrics
+from services.weaviate_service import SIMILAR_COURSE_PROPERTIES, fetch_all_course_vectors
+
+
+load_dotenv()
+
+
+logger = logging.getLogger("Vector Index")
+
+
+class VectorIndexMode(str, Enum):
+    off = "off"
+    # Used only when the Weaviate hybrid query fails
+    fallback = "fallback"
+    # Serves every similarity search, Weaviate is not queried
+    primary = "primary"
+
+
+VECTOR_INDEX_MODE = VectorIndexMode(os.getenv("VECTOR_INDEX", VectorIndexMode.fallback.value))
+
+# Same defaults as the Weaviate hybrid query and its BM25 ranking
+HYBRID_ALPHA = 0.6
+HYBRID_LIMIT = 12
+HYBRID_CANDIDATES = 100
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+TOKEN_PATTERN = re.compile(r"\w+")
+STOPWORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "but", "by", "for", "if", "in", "into", "is", "it",
+    "no", "not", "of", "on", "or", "such", "that", "the", "their", "then", "there", "these",
+    "they", "this", "to", "was", "will", "with",
+}
+
+
+VECTOR_INDEX_SIZE = metrics.gauge(
+    "vector_index_courses",
+    "Courses held in the in-process vector index"
+)
+VECTOR_INDEX_SEARCH_SECONDS = metrics.histogram(
+    "vector_index_search_seconds",
+    "In-process hybrid search latency",
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05)
+)
+
+
+def tokenize(text: str) -> list[str]:
+    return [token for token in TOKEN_PATTERN.findall(text.lower()) if token not in STOPWORDS]
+
+
+def searchable_text(properties: dict) -> str:
+    parts = []
+    for value in properties.values():
+        if isinstance(value, str):
+            parts.append(value)
+        elif isinstance(value, list):
+            parts.extend(item for item in value if isinstance(item, str))
+    return " ".join(parts)
+
+
+def relative_scores(scores: np.ndarray, candidates: np.ndarray) -> np.ndarray:
+    """Min-max normalised scores of the candidates (relativeScoreFusion), zero elsewhere"""
+    normalized = np.zeros(len(scores), dtype=np.float32)
+    if not len(candidates):
+        return normalized
+
+    selected = scores[candidates]
+    low, high = selected.min(), selected.max()
+    normalized[candidates] = 1.0 if high == low else (selected - low) / (high - low)
+    return normalized
+
+
+class CourseVectorIndex:
+    """
+    In-memory mirror of the course collection: a row-normalised float32 matrix
+    for vector search and a BM25 inverted index over the text properties,
+    fused the way the Weaviate hybrid query does.
+    """
+
+    def __init__(self, objects: list[tuple[dict, list[float]]]):
+        self.properties = [
+            {name: properties.get(name) for name in SIMILAR_COURSE_PROPERTIES}
+            for properties, _ in objects
+        ]
+
+        matrix = np.asarray([vector for _, vector in objects], dtype=np.float32)
+        if not len(objects):
+            matrix = np.zeros((0, 0), dtype=np.float32)
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        norms[norms == 0] = 1
+        self.matrix = matrix / norms
+
+        documents = [Counter(tokenize(searchable_text(properties))) for properties, _ in objects]
+        self.doc_lengths = np.asarray([sum(doc.values()) for doc in documents], dtype=np.float32)
+        self.avg_length = float(self.doc_lengths.mean()) if len(documents) else 1.0
+
+        postings: dict[str, list[tuple[int, int]]] = defaultdict(list)
+        for doc_index, doc in enumerate(documents):
+            for term, frequency in doc.items():
+                postings[term].append((doc_index, frequency))
+
+        self.postings = {
+            term: (
+                np.asarray([doc_index for doc_index, _ in entries], dtype=np.int32),
+                np.asarray([frequency for _, frequency in entries], dtype=np.float32),
+            )
+            for term, entries in postings.items()
+        }
+        self.idf = {
+            term: math.log(1 + (len(documents) - len(entries) + 0.5) / (len(entries) + 0.5))
+            for term, entries in postings.items()
+        }
+
+    def __len__(self) -> int:
+        return len(self.properties)
+
+    def vector_scores(self, vector: list[float]) -> np.ndarray:
+        query = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(query)
+        return self.matrix @ (query / norm if norm else query)
+
+    def keyword_scores(self, query: str) -> np.ndarray:
+        scores = np.zeros(len(self), dtype=np.float32)
+        for term in set(tokenize(query)):
+            if term not in self.postings:
+                continue
+            doc_indexes, frequencies = self.postings[term]
+            length_norm = 1 - BM25_B + BM25_B * self.doc_lengths[doc_indexes] / self.avg_length
+            scores[doc_indexes] += self.idf[term] * frequencies * (BM25_K1 + 1) / (frequencies + BM25_K1 * length_norm)
+        return scores
+
+    def search(
+            self,
+            query: str,
+            vector: list[float],
+            limit: int = HYBRID_LIMIT,
+            alpha: float = HYBRID_ALPHA
+    ) -> list[dict]:
+        """Hybrid search returning objects shaped like `normalize_weaviate_object`"""
+        if not len(self):
+            return []
+
+        start_time = time.perf_counter()
+
+        vector_scores = self.vector_scores(vector)
+        vector_candidates = np.argsort(-vector_scores)[:HYBRID_CANDIDATES]
+
+        keyword_scores = self.keyword_scores(query)
+        keyword_matches = np.flatnonzero(keyword_scores)
+        keyword_candidates = keyword_matches[np.argsort(-keyword_scores[keyword_matches])][:HYBRID_CANDIDATES]
+
+        fused = (
+            alpha * relative_scores(vector_scores, vector_candidates)
+            + (1 - alpha) * relative_scores(keyword_scores, keyword_candidates)
+        )
+        candidates = np.union1d(vector_candidates, keyword_candidates)
+        ranked = candidates[np.argsort(-fused[candidates], kind="stable")][:limit]
+
+        VECTOR_INDEX_SEARCH_SECONDS.observe(time.perf_counter() - start_time)
+        return [
+            {
+                "course_details": self.properties[doc_index],
+                "score": float(fused[doc_index]),
+            }
+            for doc_index in ranked
+        ]
+
+
+_index: CourseVectorIndex | None = None
+
+
+def get_vector_index() -> CourseVectorIndex | None:
+    return _index
+
+
+async def load_vector_index():
+    """(Re)build the index from the Weaviate collection, the previous index serves until the swap"""
+    global _index
+    if VECTOR_INDEX_MODE == VectorIndexMode.off:
+        return
+
+    start_time = time.perf_counter()
+    try:
+        objects = await fetch_all_course_vectors()
+    except Exception:
+        logger.exception("Could not load course vectors, keeping the current index")
+        return
+
+    _index = await asyncio.to_thread(CourseVectorIndex, objects)
+    VECTOR_INDEX_SIZE.set(len(_index))
+    logger.info(f"Loaded {len(_index)} courses into the vector index in {time.perf_counter() - start_time:.2f}s")
@@ -22,6 +22,18 @@ COLLECTION_NAME = os.getenv("COLLECTION_NAME", "course_embeddings")
 WEAVIATE_HOST = os.getenv("WEAVIATE_HOST")
 WEAVIATE_PORT = int(os.getenv("WEAVIATE_PORT"))
 
+SIMILAR_COURSE_PROPERTIES = [
+    'course_title',
+    'slug',
+    'category',
+    'skills',
+    'prerequisites',
+    'hero_features',
+    'target_audience',
+    'duration',
+    'pricing',
+]
+
 weaviate_client: WeaviateAsyncClient = weaviate.use_async_with_weaviate_cloud(
     auth_credentials=Auth.api_key(WEAVIATE_KEY),
     cluster_url=WEAVIATE_URL,
@@ -133,17 +145,7 @@ async def fetch_similar_courses(query: str, vector: list[float] | list[int]):
                     limit=12,
                     alpha=0.6,
                     vector=vector,
-        return_properties=[
-            'course_title',
-            'slug',
-            'category',
-            'skills',
-            'prerequisites',
-            'hero_features',
-            'target_audience',
-            'duration',
-            'pricing',
-        ],
+        return_properties=SIMILAR_COURSE_PROPERTIES,
         return_metadata=MetadataQuery(
                     score=True,
                     last_update_time=False,
@@ -161,4 +163,17 @@ async def fetch_similar_courses(query: str, vector: list[float] | list[int]):
 
     normalized_objects = [normalize_weaviate_object(obj) for obj in result.objects]
 
-    return normalized_objects
\ No newline at end of file
+    return normalized_objects
+
+
+async def fetch_all_course_vectors() -> list[tuple[dict, list[float]]]:
+    """Properties and vector of every object in the collection"""
+    collection = weaviate_client.collections.get(COLLECTION_NAME)
+
+    objects = []
+    async for obj in collection.iterator(include_vector=True):
+        vector = obj.vector.get("default") if isinstance(obj.vector, dict) else obj.vector
+        if vector:
+            objects.append((obj.properties, vector))
+
+    return objects
@@ -0,0 +1,11 @@
+import os
+
+
+# Module level clients read these at import time, no connection is opened by the tests
+os.environ.setdefault("OPENAI_API_KEY", "sk-test")
+os.environ.setdefault("WEAVIATE_URL", "localhost")
+os.environ.setdefault("WEAVIATE_PORT", "8080")
+os.environ.setdefault("WEAVIATE_GRPC_PORT", "50051")
+os.environ.setdefault("WEAVIATE_HOST", "localhost")
+os.environ.setdefault("WEAVIATE_GRPC_HOST", "localhost")
+os.environ.setdefault("WEAVIATE_API_KEY", "test")
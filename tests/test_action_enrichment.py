@@ -0,0 +1,95 @@
+import asyncio
+from unittest.mock import AsyncMock
+
+import pytest
+
+from assistants.sales import action_enrichment, fact_resolver
+
+
+COURSES = {
+    "python-basics": {"id": "65f0c0ffee", "slug": "python-basics", "title": "Python Basics"},
+    "react-pro": {"id": "65f0decade", "slug": "react-pro", "title": "React Pro"},
+}
+
+
+def mongo_result(slug: str):
+    return ([COURSES[slug]] if slug in COURSES else []), "db"
+
+
+def cached_result(slug: str):
+    if slug not in COURSES:
+        return None, None
+    return {"slug": slug, "data": [COURSES[slug]], "source": "mongo_db", "updated_at": 0}, "cache"
+
+
+@pytest.fixture
+def page_data(monkeypatch):
+    """Mocked `resolve_page_data_by_slug`, Mongo result shape unless a test swaps the side effect"""
+    resolve = AsyncMock(side_effect=mongo_result)
+    monkeypatch.setattr(fact_resolver, "resolve_page_data_by_slug", resolve)
+    return resolve
+
+
+def enrich(actions: list[dict]) -> list[dict]:
+    return asyncio.run(action_enrichment.enrich_actions(actions, {}))
+
+
+@pytest.mark.parametrize("shape", [mongo_result, cached_result])
+def test_slug_actions_become_buttons(page_data, shape):
+    page_data.side_effect = shape
+
+    actions = enrich([
+        {"type": "interest", "slug": "python-basics"},
+        {"type": "details", "slug": "react-pro"},
+    ])
+
+    assert actions == [
+        {
+            "type": "interest",
+            "label": "I'm interested in Python Basics",
+            "course": {"id": "65f0c0ffee", "title": "Python Basics", "slug": "python-basics"},
+        },
+        {
+            "type": "details",
+            "label": "View Details: React Pro",
+            "course": {"id": "65f0decade", "title": "React Pro", "slug": "react-pro"},
+        },
+    ]
+
+
+def test_unknown_and_duplicate_slugs_are_dropped(page_data):
+    actions = enrich([
+        {"type": "interest", "slug": "python-basics"},
+        {"type": "interest", "slug": "python-basics"},
+        {"type": "details", "slug": "no-such-course"},
+    ])
+
+    assert [(action["type"], action["course"]["slug"]) for action in actions] == [("interest", "python-basics")]
+    assert page_data.await_count == 2
+
+
+def test_failed_lookup_drops_only_its_action(page_data):
+    def resolve(slug: str):
+        if slug == "react-pro":
+            raise ConnectionError("mongo down")
+        return mongo_result(slug)
+
+    page_data.side_effect = resolve
+
+    actions = enrich([
+        {"type": "details", "slug": "react-pro"},
+        {"type": "interest", "slug": "python-basics"},
+    ])
+
+    assert [action["course"]["slug"] for action in actions] == ["python-basics"]
+
+
+def test_actions_with_a_course_pass_through(page_data):
+    action = {
+        "type": "details",
+        "label": "View Details: Python Basics",
+        "course": {"id": "65f0c0ffee", "title": "Python Basics", "slug": "python-basics"},
+    }
+
+    assert enrich([action]) == [action]
+    page_data.assert_not_awaited()
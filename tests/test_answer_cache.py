@@ -0,0 +1,77 @@
+import asyncio
+
+import numpy as np
+import pytest
+
+from services import answer_cache
+
+
+class FakeRedis:
+    def __init__(self, hashes: dict):
+        self.hashes = hashes
+
+    async def hget(self, key, field):
+        return self.hashes.get(key, {}).get(field)
+
+    async def hgetall(self, key):
+        return {field.encode(): value for field, value in self.hashes.get(key, {}).items()}
+
+    async def hset(self, key, field, value):
+        self.hashes.setdefault(key, {})[field] = value
+
+    async def hlen(self, key):
+        return len(self.hashes.get(key, {}))
+
+    async def expire(self, key, seconds, nx=False):
+        return True
+
+
+@pytest.fixture
+def embeddings(monkeypatch):
+    """Message → vector table standing in for the embedding model"""
+    vectors = {}
+    hashes = {}
+
+    async def get_query_embedding(message: str) -> np.ndarray:
+        return np.asarray(vectors[message], dtype="<f4")
+
+    monkeypatch.setattr(answer_cache, "get_query_embedding", get_query_embedding)
+    monkeypatch.setattr(answer_cache, "redis_client", FakeRedis(hashes))
+    monkeypatch.setattr(answer_cache, "redis_binary_client", FakeRedis(hashes))
+    return vectors
+
+
+REPLY = {"speech": "The fee is ₹4,999.", "intent": "course_inquiry", "confidence": "high", "actions": []}
+
+
+def test_similar_question_is_served_from_packed_vectors(embeddings):
+    embeddings["what is the fee"] = [1.0, 0.0, 0.0]
+    embeddings["how much is the fee"] = [0.99, 0.05, 0.0]
+    embeddings["is there a certificate"] = [0.0, 1.0, 0.0]
+
+    async def scenario():
+        _, embedding = await answer_cache.lookup_answer("python-basics", "what is the fee")
+        await answer_cache.store_answer("python-basics", "what is the fee", embedding, REPLY)
+        return (
+            await answer_cache.lookup_answer("python-basics", "how much is the fee"),
+            await answer_cache.lookup_answer("python-basics", "is there a certificate"),
+        )
+
+    (hit, _), (miss, _) = asyncio.run(scenario())
+
+    assert hit == REPLY
+    assert miss is None
+
+
+def test_vectors_of_another_size_are_ignored(embeddings):
+    embeddings["what is the fee"] = [1.0, 0.0]
+    embeddings["what is the fee?"] = [1.0, 0.0, 0.0]
+
+    async def scenario():
+        _, embedding = await answer_cache.lookup_answer("python-basics", "what is the fee")
+        await answer_cache.store_answer("python-basics", "what is the fee", embedding, REPLY)
+        return await answer_cache.lookup_answer("python-basics", "what is the fee?")
+
+    reply, _ = asyncio.run(scenario())
+
+    assert reply is None
@@ -0,0 +1,75 @@
+import asyncio
+from unittest.mock import AsyncMock
+
+import pytest
+
+from assistants.sales import fact_resolver
+
+
+COURSE = {
+    "id": "65f0c0ffee",
+    "slug": "python-basics",
+    "title": "Python Basics",
+    "fee": "₹4,999",
+    "duration": "8 weeks",
+}
+
+CONTEXT = {
+    "page_context": {
+        "page_type": "particular_course_page",
+        "slug": "python-basics",
+    },
+}
+
+
+def cached_entry(document: dict) -> dict:
+    """Shape of a page cache hit, see `build_page_entry`"""
+    return {"slug": document["slug"], "data": [document], "source": "mongo_db", "updated_at": 0}
+
+
+@pytest.fixture
+def page_data(monkeypatch):
+    """Mocked `resolve_page_data_by_slug`, tests set its return value"""
+    resolve = AsyncMock(return_value=([COURSE], "db"))
+    monkeypatch.setattr(fact_resolver, "resolve_page_data_by_slug", resolve)
+    monkeypatch.setattr(fact_resolver, "FACT_RESOLVER_ENABLED", True)
+    return resolve
+
+
+def resolve(message: str) -> dict | None:
+    return asyncio.run(fact_resolver.resolve_fact_question(message, dict(CONTEXT)))
+
+
+@pytest.mark.parametrize("shape", ["mongo", "cache"])
+def test_fee_question_is_answered_from_page_data(page_data, shape):
+    page_data.return_value = ([COURSE], "db") if shape == "mongo" else (cached_entry(COURSE), "cache")
+
+    reply = resolve("What is the fee?")
+
+    assert reply["intent"] == "course_inquiry"
+    assert "₹4,999" in reply["speech"]
+    assert "Python Basics" in reply["speech"]
+    assert reply["actions"][0]["course"] == {"id": "65f0c0ffee", "title": "Python Basics", "slug": "python-basics"}
+
+
+def test_missing_field_goes_to_the_agent(page_data):
+    page_data.return_value = ([{key: value for key, value in COURSE.items() if key != "duration"}], "db")
+
+    assert resolve("How long is the course?") is None
+
+
+def test_unknown_course_goes_to_the_agent(page_data):
+    page_data.return_value = ([], "db")
+
+    assert resolve("What is the fee?") is None
+
+
+def test_lookup_error_goes_to_the_agent(page_data):
+    page_data.side_effect = ConnectionError("mongo down")
+
+    assert resolve("What is the fee?") is None
+
+
+def test_question_without_a_single_fact_is_not_looked_up(page_data):
+    assert resolve("Tell me about the fee and duration") is None
+    page_data.assert_not_awaited()
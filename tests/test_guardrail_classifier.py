@@ -0,0 +1,40 @@
+import asyncio
+
+import pytest
+
+from assistants.sales import guardrail_classifier
+from assistants.sales.guardrail_classifier import PreClassifierMode, match_patterns
+from model.output_schema import GuardrailDecision
+
+
+@pytest.fixture
+def preclassifier_on(monkeypatch):
+    monkeypatch.setattr(guardrail_classifier, "PRECLASSIFIER_MODE", PreClassifierMode.on)
+    monkeypatch.setattr(guardrail_classifier, "PRECLASSIFIER_USE_EMBEDDINGS", False)
+
+
+@pytest.mark.parametrize("message", [
+    "help me debug my code for the course project",
+    "fix my code, the course quiz fails",
+])
+def test_technical_requests_mentioning_a_course_are_out_of_scope(message):
+    assert match_patterns(message).decision == GuardrailDecision.out_of_scope_technical
+
+
+def test_course_questions_are_routed():
+    assert match_patterns("what is the fee for this course").decision == GuardrailDecision.course_inquiry
+
+
+@pytest.mark.parametrize("message", ["ok", "okay!", "got it", "great"])
+def test_bare_acknowledgement_is_left_to_the_model(preclassifier_on, message):
+    verdict, local_verdict = asyncio.run(guardrail_classifier.preclassify(message))
+
+    assert verdict is None
+    assert local_verdict.decision == GuardrailDecision.greeting_or_small_talk
+
+
+def test_goodbye_skips_the_model(preclassifier_on):
+    verdict, _ = asyncio.run(guardrail_classifier.preclassify("bye"))
+
+    assert verdict.guardrail_decision == GuardrailDecision.greeting_or_small_talk
+    assert verdict.speech
@@ -0,0 +1,106 @@
+import asyncio
+import json
+
+import httpx
+import openai
+import pytest
+from openai import AsyncOpenAI
+
+from services import ingestion, openai_client, similarity
+
+
+EMBEDDING_SIZE = 8
+
+
+class FakeRedis:
+    def __init__(self):
+        self.values = {}
+
+    async def get(self, key):
+        return self.values.get(key)
+
+    async def set(self, key, value, ex=None):
+        self.values[key] = value
+
+    async def delete(self, *keys):
+        return sum(self.values.pop(key, None) is not None for key in keys)
+
+
+@pytest.fixture
+def openai_requests(monkeypatch):
+    """
+    Routes the shared client through an async-only mock transport and records
+    every request. Creating the sync client or sending a sync HTTP request fails
+    the test, so a blocking call on the event loop cannot slip through.
+    """
+    requests = []
+
+    async def handle(request: httpx.Request) -> httpx.Response:
+        requests.append(request)
+        inputs = json.loads(request.content)["input"]
+        return httpx.Response(200, json={
+            "object": "list",
+            "data": [
+                {"object": "embedding", "index": index, "embedding": [0.1] * EMBEDDING_SIZE}
+                for index, _ in enumerate(inputs)
+            ],
+            "model": similarity.EMBEDDING_MODEL,
+            "usage": {"prompt_tokens": 1, "total_tokens": 1},
+        })
+
+    def sync_call(*args, **kwargs):
+        raise AssertionError("Sync OpenAI call made on the event loop")
+
+    client = AsyncOpenAI(
+        api_key="sk-test",
+        http_client=httpx.AsyncClient(transport=httpx.MockTransport(handle)),
+    )
+    monkeypatch.setattr(openai_client, "_client", client)
+    monkeypatch.setattr(openai, "OpenAI", sync_call)
+    monkeypatch.setattr(httpx.Client, "send", sync_call)
+
+    monkeypatch.setattr(similarity, "redis_client", FakeRedis())
+    monkeypatch.setattr(similarity, "redis_binary_client", FakeRedis())
+
+    return requests
+
+
+def test_query_embedding_awaits_shared_async_client(openai_requests):
+    embedding = asyncio.run(similarity.get_query_embedding("Python courses"))
+
+    assert len(openai_requests) == 1
+    assert openai_requests[0].url.path.endswith("/embeddings")
+    assert embedding.shape == (EMBEDDING_SIZE,)
+
+
+def test_cached_query_embedding_makes_no_request(openai_requests):
+    asyncio.run(similarity.get_query_embedding("Python courses"))
+    asyncio.run(similarity.get_query_embedding("python  courses"))
+
+    assert len(openai_requests) == 1
+
+
+def test_ingestion_embeds_through_shared_async_client(openai_requests, monkeypatch):
+    upserted = []
+
+    async def upsert_course_embedding(data: dict) -> bool:
+        upserted.append(data)
+        return True
+
+    monkeypatch.setattr(ingestion, "upsert_course_embedding", upsert_course_embedding)
+
+    course = {
+        "slug": "python-basics",
+        "course_title": "Python Basics",
+        "fee": "100",
+        "skills": "Python",
+        "category": "Programming",
+        "hero_features": "Hands-on projects",
+        "curriculum": "Variables, loops",
+        "course_description": "Learn Python",
+        "faqs": "None",
+    }
+
+    assert asyncio.run(ingestion.ingest_course_embedding([course]))
+    assert len(openai_requests) == 1
+    assert len(upserted[0]["embedding"]) == EMBEDDING_SIZE